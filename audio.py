@@ -0,0 +1,105 @@
+import os
+import shutil
+import asyncio
+import hashlib
+from collections import OrderedDict
+import metrics
+
+# --- CONFIG ---
+MAX_AUDIO_BYTES = int(os.getenv("MAX_AUDIO_BYTES", 10 * 1024 * 1024))  # skip bigger voice notes without downloading
+MAX_AUDIO_SECONDS = int(os.getenv("MAX_AUDIO_SECONDS", 120))            # skip longer ones, and cut transcodes here
+TRANSCODE_WORKERS = int(os.getenv("TRANSCODE_WORKERS", os.cpu_count() or 2))
+TRANSCODE_TIMEOUT = 30
+TRANSCRIPT_CACHE_SIZE = 1024
+FFMPEG = shutil.which("ffmpeg")
+AUDIO_EXTENSIONS = ("ogg", "mp3", "wav", "m4a")
+
+
+class VoiceNotes:
+    """Turns voice-note attachments into transcripts as cheaply as possible.
+
+    Oversized or overlong notes are refused from the attachment metadata alone.
+    Everything else is hashed after download; a known hash (a re-sent or
+    forwarded note) returns the cached transcript. New audio is downmixed to
+    16 kHz mono opus by ffmpeg, at most TRANSCODE_WORKERS at a time, before it
+    goes to transcribe(bytes, filename). Without ffmpeg the raw bytes are sent.
+    """
+
+    def __init__(self, transcribe, workers=TRANSCODE_WORKERS, cache_size=TRANSCRIPT_CACHE_SIZE):
+        self.transcribe = transcribe
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # sha256 -> transcript
+        self._workers = asyncio.Semaphore(workers)
+        self.hits = 0
+        self.misses = 0
+        self.refused = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    def _refuse(self, att):
+        if att.size > MAX_AUDIO_BYTES: return "too_big"
+        if (getattr(att, "duration", None) or 0) > MAX_AUDIO_SECONDS: return "too_long"
+        return None
+
+    async def transcript(self, att):
+        """Transcript of a voice-note attachment, or None."""
+        reason = self._refuse(att)
+        if reason:
+            self.refused += 1
+            metrics.inc("voice_notes", result=reason)
+            print(f"🔇 Skipped voice note {att.filename} ({reason}: {att.size} bytes).")
+            return None
+
+        data = await att.read()
+        key = hashlib.sha256(data).hexdigest()
+        text = self._cache.get(key)
+        if text is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            metrics.inc("voice_notes", result="cached")
+            return text
+
+        self.misses += 1
+        audio, filename = await self.transcode(data, att.filename.lower())
+        text = await self.transcribe(audio, filename)
+        metrics.inc("voice_notes", result="transcribed" if text else "failed")
+        if text:
+            self._cache[key] = text
+            while len(self._cache) > self.cache_size: self._cache.popitem(last=False)
+        return text
+
+    async def transcode(self, data, filename):
+        """(bytes, filename) ready for upload: 16 kHz mono opus, or the input untouched on failure."""
+        self.bytes_in += len(data)
+        if not FFMPEG:
+            self.bytes_out += len(data)
+            return data, filename
+        async with self._workers:
+            with metrics.timer("audio_transcode"):
+                try:
+                    proc = await asyncio.create_subprocess_exec(
+                        FFMPEG, "-nostdin", "-hide_banner", "-loglevel", "error",
+                        "-i", "pipe:0", "-t", str(MAX_AUDIO_SECONDS),
+                        "-ac", "1", "-ar", "16000", "-c:a", "libopus", "-b:a", "24k", "-f", "ogg", "pipe:1",
+                        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                    )
+                    try:
+                        out, err = await asyncio.wait_for(proc.communicate(data), TRANSCODE_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        raise RuntimeError("timed out")
+                    finally:
+                        # Timed out or cancelled by the caller's stage budget: don't leave ffmpeg running.
+                        if proc.returncode is None:
+                            proc.kill()
+                            await asyncio.shield(proc.wait())
+                    if proc.returncode != 0 or not out:
+                        raise RuntimeError(err.decode(errors="ignore").strip()[:200] or f"exit {proc.returncode}")
+                except Exception as e:
+                    print(f"Transcode Error ({filename}): {e}")
+                    self.bytes_out += len(data)
+                    return data, filename
+        self.bytes_out += len(out)
+        return out, "voice.ogg"
@@ -0,0 +1,628 @@
+"""Offline load test for the reply pipeline.
+
+Replays a synthetic stream of mentions and slash commands through the real
+AI and Social cogs, with Discord, Mongo, Gemini, Groq and DuckDuckGo replaced
+by in-process fakes whose latency and error rates are configurable. Nothing
+leaves the machine and no keys are needed.
+
+    python bench.py --events 2000 --concurrency 32 --gemini-ms 900 --gemini-errors 0.05
+
+Reports messages/sec, p50/p99 reply latency per event kind, and Mongo and
+Discord calls per event.
+"""
+import os
+import io
+import sys
+import time
+import types
+import random
+import asyncio
+import argparse
+import datetime
+from collections import Counter, defaultdict
+
+# --- LATENCY MODEL ---
+class Dist:
+    """Log-normal latency around a median, plus an independent failure rate."""
+    def __init__(self, median_ms, errors=0.0, spread=0.5):
+        self.median_ms = median_ms
+        self.errors = errors
+        self.spread = spread
+
+    def sample(self):
+        if self.median_ms <= 0: return 0.0
+        return random.lognormvariate(0, self.spread) * self.median_ms / 1000
+
+    def fails(self):
+        return random.random() < self.errors
+
+    async def wait(self, what):
+        await asyncio.sleep(self.sample())
+        if self.fails(): raise RuntimeError(f"simulated {what} failure")
+
+    def block(self, what):
+        time.sleep(self.sample())
+        if self.fails(): raise RuntimeError(f"simulated {what} failure")
+
+DISTS = {}  # filled from the command line before the cogs are imported
+
+REPLIES = [
+    "bruh 💀", "fr fr no cap", "ur literally so mid lmao", "ok but why would u say that in public",
+    "i'm in beta read my bio 🙄", "that's lowkey kinda valid tho", "sybau 😭", "who asked",
+]
+GIF_TAGS = ["anime girl smug", "tohru dragon maid happy", "anime facepalm", "cat stare"]
+
+def fake_reply():
+    text = random.choice(REPLIES)
+    if random.random() < DISTS["gif_rate"]: text += f" [GIF: {random.choice(GIF_TAGS)}]"
+    return text
+
+# --- SDK STUBS (installed into sys.modules before the cogs import them) ---
+def install_stubs():
+    # google.generativeai
+    genai = types.ModuleType("google.generativeai")
+    genai_types = types.ModuleType("google.generativeai.types")
+
+    class _Enum:
+        def __getattr__(self, name): return name
+
+    genai_types.HarmCategory = _Enum()
+    genai_types.HarmBlockThreshold = _Enum()
+
+    class GenerativeModel:
+        def __init__(self, model_name, **_):
+            self.model_name = model_name
+
+        async def generate_content_async(self, contents, stream=False):
+            await DISTS["gemini"].wait(self.model_name)
+            text = fake_reply()
+            if not stream: return types.SimpleNamespace(text=text)
+
+            async def chunks():
+                words = text.split(" ")
+                for i, word in enumerate(words):
+                    await asyncio.sleep(0.02)
+                    yield types.SimpleNamespace(text=word if i == 0 else " " + word)
+            return chunks()
+
+    genai.configure = lambda **_: None
+    genai.GenerativeModel = GenerativeModel
+    genai.types = genai_types
+    google = sys.modules.get("google") or types.ModuleType("google")
+    google.generativeai = genai
+    sys.modules.update({"google": google, "google.generativeai": genai, "google.generativeai.types": genai_types})
+
+    # groq
+    groq = types.ModuleType("groq")
+
+    class _Completions:
+        async def create(self, model, messages, stream=False, **_):
+            await DISTS["groq"].wait(model)
+            text = fake_reply()
+            if not stream:
+                return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=text))])
+
+            async def chunks():
+                for word in text.split(" "):
+                    await asyncio.sleep(0.01)
+                    yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=word + " "))])
+            return chunks()
+
+    class _Transcriptions:
+        async def create(self, file, **_):
+            await DISTS["whisper"].wait("whisper")
+            return types.SimpleNamespace(text="yo yuri what do u think of my voice")
+
+    class AsyncGroq:
+        def __init__(self, api_key=None):
+            self.api_key = api_key
+            self.chat = types.SimpleNamespace(completions=_Completions())
+            self.audio = types.SimpleNamespace(transcriptions=_Transcriptions())
+
+    groq.AsyncGroq = AsyncGroq
+    sys.modules["groq"] = groq
+
+    # duckduckgo_search (blocking, like the real client; runs on utils.SEARCH_POOL)
+    ddgs = types.ModuleType("duckduckgo_search")
+
+    class DDGS:
+        def text(self, query, max_results=2):
+            DISTS["search"].block("search")
+            return [{"title": f"{query} result {i}", "body": "some snippet text"} for i in range(max_results)]
+
+        def images(self, keywords, max_results=8, **_):
+            DISTS["search"].block("gif search")
+            return [{"image": f"https://gifs.example/{abs(hash(keywords)) % 997}/{i}.gif"} for i in range(max_results)]
+
+    ddgs.DDGS = DDGS
+    sys.modules["duckduckgo_search"] = ddgs
+
+# --- MONGO STAND-IN ---
+OPS = Counter()  # "collection.op" -> calls
+
+def _matches(doc, query):
+    for key, cond in query.items():
+        value = doc.get(key)
+        if isinstance(cond, dict) and any(k.startswith("$") for k in cond):
+            for op, arg in cond.items():
+                if op == "$gt" and not (value is not None and value > arg): return False
+                if op == "$gte" and not (value is not None and value >= arg): return False
+                if op == "$lt" and not (value is not None and value < arg): return False
+                if op == "$lte" and not (value is not None and value <= arg): return False
+                if op == "$in" and value not in arg: return False
+        elif value != cond:
+            return False
+    return True
+
+def _sort_spec(key, direction):
+    return [(key, direction)] if isinstance(key, str) else list(key)
+
+def _sorted(docs, spec):
+    for field, direction in reversed(spec):
+        docs = sorted(docs, key=lambda d: (d.get(field) is not None, d.get(field)), reverse=direction < 0)
+    return docs
+
+def _project(doc, projection):
+    if not projection: return dict(doc)
+    keep = {k for k, v in projection.items() if v}
+    return {k: v for k, v in doc.items() if k in keep or k == "_id"}
+
+class FakeCursor:
+    def __init__(self, collection, query, projection):
+        self.collection = collection
+        self.query = query
+        self.projection = projection
+        self._sort = []
+        self._limit = 0
+
+    def sort(self, key, direction=1):
+        self._sort = _sort_spec(key, direction)
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    async def _fetch(self):
+        await DISTS["db"].wait("mongo")
+        docs = _sorted([d for d in self.collection.docs if _matches(d, self.query)], self._sort)
+        if self._limit: docs = docs[:self._limit]
+        return [_project(d, self.projection) for d in docs]
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for doc in await self._fetch(): yield doc
+
+    async def to_list(self, length=None):
+        docs = await self._fetch()
+        return docs[:length] if length else docs
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+        self.docs = []
+
+    async def _op(self, op):
+        OPS[f"{self.name}.{op}"] += 1
+        await DISTS["db"].wait("mongo")
+
+    def find(self, query=None, projection=None):
+        OPS[f"{self.name}.find"] += 1
+        return FakeCursor(self, query or {}, projection)
+
+    async def find_one(self, query=None, projection=None):
+        await self._op("find_one")
+        return next((_project(d, projection) for d in self.docs if _matches(d, query or {})), None)
+
+    async def distinct(self, key, query=None):
+        await self._op("distinct")
+        return list({d.get(key) for d in self.docs if _matches(d, query or {})})
+
+    async def count_documents(self, query):
+        await self._op("count_documents")
+        return sum(1 for d in self.docs if _matches(d, query))
+
+    async def insert_one(self, doc):
+        await self._op("insert_one")
+        doc.setdefault("_id", _object_id())
+        self.docs.append(dict(doc))
+
+    async def insert_many(self, docs, ordered=True):
+        await self._op("insert_many")
+        for doc in docs:
+            doc.setdefault("_id", _object_id())
+            self.docs.append(dict(doc))
+
+    def _upsert(self, query, update):
+        doc = next((d for d in self.docs if _matches(d, query)), None)
+        if doc is None:
+            doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            doc["_id"] = _object_id()
+            self.docs.append(doc)
+        doc.update(update.get("$set", {}))
+        for k, n in update.get("$inc", {}).items(): doc[k] = doc.get(k, 0) + n
+        for k, v in update.get("$max", {}).items(): doc[k] = v if doc.get(k) is None else max(doc[k], v)
+        for k, v in update.get("$min", {}).items(): doc[k] = v if doc.get(k) is None else min(doc[k], v)
+        return doc
+
+    async def update_one(self, query, update, upsert=False):
+        await self._op("update_one")
+        if upsert or any(_matches(d, query) for d in self.docs): self._upsert(query, update)
+
+    async def bulk_write(self, requests, ordered=True):
+        await self._op("bulk_write")
+        for req in requests: self._upsert(req._filter, req._doc)
+
+    async def find_one_and_update(self, query, update, upsert=False, **_):
+        await self._op("find_one_and_update")
+        return dict(self._upsert(query, update))
+
+    async def find_one_and_delete(self, query, sort=None):
+        await self._op("find_one_and_delete")
+        docs = _sorted([d for d in self.docs if _matches(d, query)], sort or [])
+        if not docs: return None
+        self.docs.remove(docs[0])
+        return docs[0]
+
+    async def delete_one(self, query):
+        await self._op("delete_one")
+        doc = next((d for d in self.docs if _matches(d, query)), None)
+        if doc: self.docs.remove(doc)
+
+    async def delete_many(self, query):
+        await self._op("delete_many")
+        self.docs = [d for d in self.docs if not _matches(d, query)]
+
+    async def create_index(self, *_, **__):
+        return "bench"
+
+def _object_id():
+    from bson import ObjectId
+    return ObjectId()
+
+# --- DISCORD FAKES ---
+API_CALLS = Counter()
+
+class FakeAsset:
+    def __init__(self, key):
+        self.key = key
+        self.url = f"https://cdn.example/avatars/{key}.png"
+
+    def with_size(self, size):
+        return self
+
+class FakeUser:
+    def __init__(self, user_id, name):
+        self.id = user_id
+        self.name = self.display_name = name
+        self.mention = f"<@{user_id}>"
+        self.bot = False
+        self.created_at = datetime.datetime(2021, 3, 1, tzinfo=datetime.timezone.utc)
+        self.roles = []
+        self.status = "online"
+        self.activity = None
+        self.display_avatar = FakeAsset(f"a{user_id}")
+        self.top_role = 0
+
+    def mentioned_in(self, message):
+        return self in message.mentions
+
+class FakeMessage:
+    _ids = iter(range(10**9))
+
+    def __init__(self, channel, author, content="", attachments=(), mentions=(), guild=None):
+        self.id = next(self._ids)
+        self.channel = channel
+        self.guild = guild
+        self.author = author
+        self.content = content
+        self.attachments = list(attachments)
+        self.mentions = list(mentions)
+        self.reference = None
+        self.embeds = []
+
+    async def reply(self, content=None, mention_author=False, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+    async def edit(self, content=None, embed=None):
+        API_CALLS["edit"] += 1
+        await DISTS["discord"].wait("discord edit")
+        if content is not None: self.content = content
+        if embed is not None: self.embeds = [embed]
+        return self
+
+    async def delete(self):
+        API_CALLS["delete"] += 1
+        await DISTS["discord"].wait("discord delete")
+
+class _Typing:
+    async def __aenter__(self): return self
+    async def __aexit__(self, *exc): return False
+
+class FakeChannel:
+    def __init__(self, channel_id, bot_user):
+        self.id = channel_id
+        self.bot_user = bot_user
+
+    def typing(self):
+        return _Typing()
+
+    async def send(self, content=None, embed=None, file=None, **_):
+        API_CALLS["send"] += 1
+        await DISTS["discord"].wait("discord send")
+        msg = FakeMessage(self, self.bot_user, content or "")
+        if embed: msg.embeds = [embed]
+        return msg
+
+class FakeAttachment:
+    def __init__(self, filename, payload):
+        self.filename = filename
+        self.url = f"https://cdn.example/attachments/{filename}"
+        self.payload = payload
+        self.size = len(payload)
+        self.duration = 4.0 if filename.endswith(".ogg") else None
+        self.content_type = "audio/ogg" if filename.endswith(".ogg") else "image/png"
+
+    async def read(self):
+        await DISTS["download"].wait("attachment download")
+        return self.payload
+
+class _Response:
+    def __init__(self): self.done = False
+    async def defer(self, ephemeral=False, **_): self.done = True
+    async def send_message(self, content=None, ephemeral=False, **_):
+        API_CALLS["send"] += 1
+        await DISTS["discord"].wait("discord send")
+        self.done = True
+    def is_done(self): return self.done
+
+class _Followup:
+    def __init__(self, channel): self.channel = channel
+    async def send(self, content=None, ephemeral=False, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+class FakeGuild:
+    def __init__(self, guild_id, bot_user):
+        self.id = guild_id
+        self.me = types.SimpleNamespace(top_role=10, id=bot_user.id)
+
+    def get_channel(self, channel_id):
+        return None
+
+class FakeInteraction:
+    def __init__(self, user, channel, guild):
+        self.user = user
+        self.channel = channel
+        self.channel_id = channel.id
+        self.guild = guild
+        self.guild_id = guild.id
+        self.response = _Response()
+        self.followup = _Followup(channel)
+
+# --- HTTP FAKE (avatar + image downloads) ---
+def _png(size=256):
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new("RGB", (size, size), (255, 105, 180)).save(buf, "PNG")
+    return buf.getvalue()
+
+class _Content:
+    def __init__(self, data): self.data = data
+    async def iter_chunked(self, n):
+        for i in range(0, len(self.data), n): yield self.data[i:i + n]
+
+class _HTTPResponse:
+    def __init__(self, data):
+        self.status = 200
+        self.content_length = len(data)
+        self.content = _Content(data)
+    async def __aenter__(self):
+        await DISTS["download"].wait("download")
+        return self
+    async def __aexit__(self, *exc): return False
+
+class FakeSession:
+    def __init__(self):
+        self.image = _png()
+    def get(self, url, **_):
+        API_CALLS["http_get"] += 1
+        return _HTTPResponse(self.image)
+    async def close(self): pass
+
+# --- BOT ---
+class FakeBot:
+    def __init__(self, users, limited=False):
+        import utils
+        import limits
+        from memory import ChatMemory, ChatWriter, ChatSummaries, ActivityStats
+        from state import SettingsCache, KeyHealth
+        from pools import ContentPool
+
+        self.user = FakeUser(1, "Yuri")
+        self.owner_id = 0
+        self.command_prefix = "!"
+        self.cogs = {}
+        self._ready = asyncio.Event()  # never set: the cogs' background loops stay parked
+        self.session = FakeSession()
+        self.avatar_cache = utils.ImageCache()
+        self.ship_cache = utils.ImageCache(16 * 1024 * 1024)
+        for name in ("chat_history", "server_configs", "crushes", "grudges", "feedback", "content_pool", "chat_summaries", "user_stats"):
+            setattr(self, {"chat_history": "chat_collection", "server_configs": "config_collection", "crushes": "crush_collection",
+                           "grudges": "grudge_collection", "feedback": "feedback_collection", "content_pool": "pool_collection",
+                           "chat_summaries": "summary_collection", "user_stats": "stats_collection"}[name], FakeCollection(name))
+        self.user_stats = ActivityStats(self.stats_collection)
+        self.chat_writer = ChatWriter(self.chat_collection, self.user_stats)
+        self.memory = ChatMemory(self.chat_collection, self.chat_writer)
+        self.summaries = ChatSummaries(self.summary_collection, self.chat_collection)
+        self.settings = SettingsCache(self.grudge_collection, self.config_collection)
+        self.content_pool = ContentPool(self.pool_collection)
+        self.key_health = KeyHealth(FakeCollection("key_health"))
+        self.limiter = limits.RateLimiter() if limited else limits.RateLimiter(None, None, None)
+        self.cluster_id = 0
+        self.clustered = False
+        self.users = users
+
+    async def wait_until_ready(self):
+        await self._ready.wait()
+
+    def get_cog(self, name):
+        return self.cogs.get(name)
+
+# --- WORKLOAD ---
+COMMANDS = ["roast", "rate", "ship", "truth", "dare"]
+PROMPTS = ["yo yuri whats up", "who won the game last night", "rate my fit", "ur so buggy lol",
+           "what's the weather in tokyo", "tell me a joke", "roast my friend pls", "how do i center a div"]
+
+def make_events(args, users):
+    events = []
+    for _ in range(args.events):
+        if random.random() < args.commands: events.append((random.choice(COMMANDS), random.choice(users)))
+        else: events.append(("mention", random.choice(users)))
+    return events
+
+async def run_event(bot, kind, user, args, image, voice):
+    ai, social = bot.cogs["AI"], bot.cogs["Social"]
+    channel = FakeChannel(100 + user.id % 8, bot.user)
+    if kind == "mention":
+        attachments = []
+        if random.random() < args.attachments:
+            attachments.append(random.choice([FakeAttachment("pic.png", image), FakeAttachment("voice-message.ogg", voice)]))
+        message = FakeMessage(channel, user, f"<@{bot.user.id}> {random.choice(PROMPTS)}", attachments, [bot.user], FakeGuild(7, bot.user))
+        await ai.on_message(message)
+        return
+    interaction = FakeInteraction(user, channel, FakeGuild(7, bot.user))
+    command = getattr(social, kind)
+    if kind in ("roast", "rate"): await command.callback(social, interaction, random.choice(bot.users))
+    elif kind == "ship": await command.callback(social, interaction, random.choice(bot.users), random.choice(bot.users))
+    else: await command.callback(social, interaction)
+
+def pct(samples, q):
+    if not samples: return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def bench(args):
+    install_stubs()
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+    for i in range(args.groq_keys):
+        os.environ.setdefault("GROQ_API_KEY" if i == 0 else f"GROQ_API_KEY_{i + 1}", f"bench-{i}")
+
+    from cogs.ai import AI
+    from cogs.social import Social
+    import metrics
+
+    users = [FakeUser(1000 + i, f"user{i}") for i in range(args.users)]
+    bot = FakeBot(users, args.limits)
+    now = datetime.datetime.utcnow()
+    for user in users:
+        for t in range(args.seed_turns):
+            role = "user" if t % 2 == 0 else "model"
+            bot.chat_collection.docs.append({"_id": _object_id(), "user_id": user.id, "role": role, "parts": [random.choice(REPLIES)],
+                                             "timestamp": now - datetime.timedelta(minutes=args.seed_turns - t)})
+    for kind in ("truth", "dare"):
+        bot.pool_collection.docs += [{"_id": _object_id(), "kind": kind, "text": f"{kind} #{i} lorem ipsum", "created_at": now}
+                                     for i in range(args.pool)]
+    await bot.content_pool.load()
+    bot.cogs["AI"] = AI(bot)
+    bot.cogs["Social"] = Social(bot)
+    bot.chat_writer.start()
+    OPS.clear()
+
+    image, voice = _png(1024), os.urandom(48 * 1024)
+    events = make_events(args, users)
+    queue = asyncio.Queue()
+    for event in events: queue.put_nowait(event)
+    latencies = defaultdict(list)
+    failures = Counter()
+
+    async def worker():
+        while not queue.empty():
+            kind, user = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                await run_event(bot, kind, user, args, image, voice)
+            except Exception as e:
+                failures[f"{kind}: {type(e).__name__}"] += 1
+            latencies[kind].append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    # Let background GIF attaches finish and the history queue drain before counting.
+    background = list(bot.cogs["AI"]._background)
+    if background: await asyncio.wait(background, timeout=30)
+    await bot.chat_writer.close()
+    for cog in bot.cogs.values(): cog.cog_unload()
+
+    n = len(events)
+    every = [ms for samples in latencies.values() for ms in samples]
+    lines = [
+        f"events {n}  concurrency {args.concurrency}  users {args.users}  wall {elapsed:.2f}s",
+        f"throughput {n / elapsed:.1f} events/s",
+        f"latency p50 {pct(every, 0.5):.0f}ms  p99 {pct(every, 0.99):.0f}ms",
+        "",
+        f"{'KIND':<10}{'n':>7}{'p50':>9}{'p99':>9}",
+    ]
+    for kind, samples in sorted(latencies.items()):
+        lines.append(f"{kind:<10}{len(samples):>7}{pct(samples, 0.5):>7.0f}ms{pct(samples, 0.99):>7.0f}ms")
+    lines += ["", f"mongo ops/event {sum(OPS.values()) / n:.2f}"]
+    lines += [f"  {op:<36}{count:>7}  ({count / n:.2f}/event)" for op, count in OPS.most_common()]
+    lines += ["", f"discord calls/event {sum(API_CALLS.values()) / n:.2f}"]
+    lines += [f"  {op:<36}{count:>7}" for op, count in API_CALLS.most_common()]
+    if failures:
+        lines += ["", "handler exceptions:"] + [f"  {k}: {v}" for k, v in failures.most_common()]
+    if args.verbose:
+        lines += ["", metrics.REGISTRY.render_table()]
+    report = "\n".join(lines)
+    print(report)
+    if args.out:
+        with open(args.out, "w") as f: f.write(report + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the Yuri message pipeline.")
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--commands", type=float, default=0.2, help="share of events that are slash commands")
+    parser.add_argument("--attachments", type=float, default=0.1, help="share of mentions carrying an image or voice note")
+    parser.add_argument("--seed-turns", type=int, default=30, help="chat turns stored per user before the run")
+    parser.add_argument("--pool", type=int, default=20, help="pre-generated /truth and /dare entries per kind")
+    parser.add_argument("--groq-keys", type=int, default=2)
+    parser.add_argument("--gemini-ms", type=float, default=800)
+    parser.add_argument("--gemini-errors", type=float, default=0.02)
+    parser.add_argument("--groq-ms", type=float, default=600)
+    parser.add_argument("--groq-errors", type=float, default=0.02)
+    parser.add_argument("--whisper-ms", type=float, default=700)
+    parser.add_argument("--search-ms", type=float, default=400)
+    parser.add_argument("--search-errors", type=float, default=0.05)
+    parser.add_argument("--db-ms", type=float, default=3)
+    parser.add_argument("--discord-ms", type=float, default=80)
+    parser.add_argument("--download-ms", type=float, default=60)
+    parser.add_argument("--gif-rate", type=float, default=0.3, help="share of replies that carry a [GIF:] tag")
+    parser.add_argument("--limits", action="store_true", help="apply the configured RATE_LIMIT_* budgets")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--out", help="also write the report to this file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="append the metrics registry table")
+    args = parser.parse_args()
+
+    if args.seed is not None: random.seed(args.seed)
+    DISTS.update({
+        "gemini": Dist(args.gemini_ms, args.gemini_errors),
+        "groq": Dist(args.groq_ms, args.groq_errors),
+        "whisper": Dist(args.whisper_ms),
+        "search": Dist(args.search_ms, args.search_errors),
+        "db": Dist(args.db_ms, spread=0.3),
+        "discord": Dist(args.discord_ms, spread=0.3),
+        "download": Dist(args.download_ms, spread=0.3),
+        "gif_rate": args.gif_rate,
+    })
+    asyncio.run(bench(args))
+
+if __name__ == "__main__":
+    main()
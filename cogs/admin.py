@@ -2,7 +2,12 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import io
+import time
 import datetime
+from typing import Optional
+import exports
+import metrics
+import outbox
 
 class Admin(commands.Cog):
     def __init__(self, bot):
@@ -15,25 +20,21 @@ class Admin(commands.Cog):
             return
 
         await interaction.response.defer(ephemeral=True)
-        await self.bot.config_collection.update_one(
-            {"guild_id": interaction.guild_id}, 
-            {"$set": {"confession_channel_id": channel.id}}, 
-            upsert=True
-        )
+        await self.bot.settings.set_config(interaction.guild_id, confession_channel_id=channel.id)
         await interaction.followup.send(f"✅ Confessions set to {channel.mention}!")
 
     @app_commands.command(name="grudge", description="Admin: Banish a user.")
     @app_commands.checks.has_permissions(administrator=True)
     async def grudge(self, interaction: discord.Interaction, member: discord.Member):
         await interaction.response.defer(ephemeral=True)
-        await self.bot.grudge_collection.update_one({"user_id": member.id}, {"$set": {"timestamp": datetime.datetime.utcnow()}}, upsert=True)
+        await self.bot.settings.add_grudge(member.id)
         await interaction.followup.send(f"💀 **Grudge added.** I now hate {member.display_name}.")
 
     @app_commands.command(name="ungrudge", description="Admin: Forgive a user.")
     @app_commands.checks.has_permissions(administrator=True)
     async def ungrudge(self, interaction: discord.Interaction, member: discord.Member):
         await interaction.response.defer(ephemeral=True)
-        await self.bot.grudge_collection.delete_one({"user_id": member.id})
+        await self.bot.settings.remove_grudge(member.id)
         await interaction.followup.send(f"✨ **Forgiven.**")
 
     @app_commands.command(name="wipe", description="Admin: Wipe user memory.")
@@ -42,64 +43,160 @@ class Admin(commands.Cog):
             await interaction.response.send_message("❌ Owner only.", ephemeral=True)
             return
         await interaction.response.defer(ephemeral=True)
+        # Drop queued/in-flight turns first, so a flush landing after the delete can't bring them back.
+        self.bot.memory.invalidate(member.id)
         await self.bot.chat_collection.delete_many({"user_id": member.id})
+        await self.bot.stats_collection.delete_many({"user_id": member.id})
+        await self.bot.summaries.forget(member.id)
         await interaction.followup.send(f"✅ Wiped memory for {member.display_name}.")
 
     @commands.command(name="wipeall")
     @commands.is_owner()
     async def wipe_all(self, ctx):
+        self.bot.memory.clear()
         await self.bot.chat_collection.delete_many({})
+        await self.bot.stats_collection.delete_many({})
+        await self.bot.summaries.forget()
         await ctx.send("⚠️ **SYSTEM PURGE:** I have forgotten EVERYONE. Database cleared.")
 
     @commands.command()
     @commands.is_owner()
     async def spy(self, ctx):
-        users = await self.bot.chat_collection.distinct("user_id")
-        await ctx.send(f"🕵️ I have data on **{len(users)}** users.")
+        users = await self.bot.user_stats.users()
+        today = await self.bot.user_stats.top(datetime.datetime.utcnow(), limit=1000)
+        await ctx.send(f"🕵️ I have data on **{users}** users. **{len(today)}** talked to me today "
+                       f"({sum(u for _, u, _ in today)} messages).")
+
+    @commands.command()
+    @commands.is_owner()
+    async def rebuildstats(self, ctx):
+        """Recounts user_stats from chat_history (first deploy, or if the counters drifted)."""
+        await ctx.send("⏳ Recounting...")
+        try:
+            users = await self.bot.user_stats.rebuild(self.bot.chat_writer)
+        except Exception as e:
+            return await ctx.send(f"❌ **Rebuild failed:** {e}")
+        await ctx.send(f"✅ Stats rebuilt for **{users}** users.")
 
     @commands.command()
     @commands.is_owner()
-    async def spysee(self, ctx, user_id: int):
-        cursor = self.bot.chat_collection.find({"user_id": user_id}).sort("timestamp", 1)
-        log = ""
-        async for doc in cursor:
+    async def stats(self, ctx):
+        writer = self.bot.chat_writer
+        avatars = self.bot.avatar_cache
+        ships = self.bot.ship_cache
+        summary = (
+            (f"🧩 **Cluster {self.bot.cluster_id}:** shards {self.bot.shard_ids} of {self.bot.shard_count}\n" if self.bot.clustered else "")
+            + f"🧠 **Memory:** {len(self.bot.memory)} users cached | {self.bot.summaries.compactions} summaries updated "
+            f"({self.bot.summaries.folded} turns folded, {len(self.bot.summaries.dirty)} waiting)\n"
+            f"🎲 **Truth/Dare Pool:** {self.bot.content_pool.sizes} | {self.bot.content_pool.served} served, {self.bot.content_pool.misses} misses\n"
+            f"🖼️ **Avatars:** {len(avatars)} cached ({avatars.used / 1048576:.1f}MB) | {avatars.hits} hits / {avatars.misses} misses | "
+            f"{len(ships)} /ship images ({ships.hits} hits / {ships.misses} misses)\n"
+            f"📝 **History Queue:** {writer.depth} pending | {writer.written} written in {writer.flushes} flushes | "
+            f"last flush {writer.last_flush_ms:.1f}ms (avg {writer.avg_flush_ms:.1f}ms)"
+            + (f" | ⚠️ {writer.dropped} dropped" if writer.dropped else "")
+            + f"\n📊 **User Stats:** {self.bot.user_stats.updates} upserts"
+            + (f" | ⚠️ {self.bot.user_stats.errors} failed batches" if self.bot.user_stats.errors else "")
+            + self._voice_report()
+            + self._limits_report()
+            + f"\n📮 **Outbox:** {outbox.OUTBOX.sent} calls over {len(outbox.OUTBOX)} channels | "
+            f"{outbox.OUTBOX.paced} paced ({outbox.OUTBOX.waited:.1f}s waited)"
+            + (f" | ⚠️ {outbox.OUTBOX.errors} failed" if outbox.OUTBOX.errors else "")
+            + self._llm_report()
+        )
+        # Per-stage latency histograms and counters ride along as a file (too wide for a message).
+        table = metrics.REGISTRY.render_table()
+        await ctx.send(summary[:2000], file=discord.File(io.BytesIO(table.encode()), filename="metrics.txt"))
+
+    def _limits_report(self):
+        limiter = self.bot.limiter
+        report = (f"\n🪣 **Rate Limits:** {limiter.allowed} allowed | limited: "
+                  + ", ".join(f"{scope} {limiter.limited[scope]}" for scope in limiter.limits))
+        for scope in limiter.limits:
+            lowest = limiter.lowest(scope, 3)
+            if lowest: report += f"\n  `{scope}` " + ", ".join(f"{key}: {tokens:.1f}/{cap:.0f}" for key, tokens, cap in lowest)
+        return report
+
+    def _voice_report(self):
+        ai = self.bot.get_cog("AI")
+        if not ai: return ""
+        voice = ai.voice
+        return (f"\n🎙️ **Voice Notes:** {len(voice)} transcripts cached | {voice.hits} hits / {voice.misses} misses / {voice.refused} refused | "
+                f"{voice.bytes_in / 1048576:.1f}MB in, {voice.bytes_out / 1048576:.1f}MB uploaded")
+
+    def _llm_report(self):
+        ai = self.bot.get_cog("AI")
+        if not ai: return ""
+        now = time.monotonic()
+        report = "\n🩺 **Backends:**\n" + "\n".join(
+            f"`{b.name}` {b.state} | ewma {b.ewma_ms or 0:.0f}ms p95 {b.p95 or 0:.0f}ms | errors {b.errors_now(now):.0%} ({b.errors}/{b.calls})"
+            for b in ai.router.backends
+        )
+        if ai.scheduler.lanes:
+            report += "\n🚦 **LLM Lanes:**\n" + "\n".join(
+                f"`{l.name}` {l.inflight}/{l.limit} busy, {l.queued} queued | wait avg {l.avg_wait_ms:.0f}ms max {l.max_wait_ms:.0f}ms | {l.shed} shed"
+                for l in ai.scheduler.lanes.values()
+            )
+        return report
+
+    async def _send_export(self, ctx, cursor, fmt, header, filename, empty):
+        file, count, size = await exports.export(cursor, fmt, header)
+        with file:
+            if count == 0: return await ctx.send(empty)
+            if size > exports.UPLOAD_LIMIT:
+                return await ctx.send(f"❌ {count} lines is {size / 1048576:.1f}MB compressed, too big to upload. Narrow the dates.")
+            await ctx.send(f"📦 {count} lines.", file=discord.File(file, filename=f"{filename}.txt.gz"))
+
+    @commands.command()
+    @commands.is_owner()
+    async def spysee(self, ctx, user_id: int, since: str = None, until: str = None):
+        """!spysee <user_id> [since] [until] (dates as YYYY-MM-DD or 7d)"""
+        query = {"user_id": user_id}
+        try: timestamps = exports.day_range(since, until)
+        except ValueError: return await ctx.send("❌ Dates are YYYY-MM-DD or like 7d.")
+        if timestamps: query["timestamp"] = timestamps
+        cursor = self.bot.chat_collection.find(query, {"_id": 0, "role": 1, "parts": {"$slice": 1}, "timestamp": 1}).sort("timestamp", 1)
+
+        def fmt(doc):
             role = "YURI" if doc['role'] == "model" else "USER"
-            log += f"[{doc['timestamp']}] {role}: {doc['parts'][0]}\n"
-        
-        if not log: return await ctx.send("No Data.")
-        await ctx.send(file=discord.File(io.BytesIO(log.encode()), filename=f"log_{user_id}.txt"))
+            return f"[{doc['timestamp']}] {role}: {doc['parts'][0]}\n"
+
+        await self._send_export(ctx, cursor, fmt, "", f"log_{user_id}", "No Data.")
 
     @commands.command()
     @commands.is_owner()
-    async def spyrecent(self, ctx):
-        now = datetime.datetime.utcnow()
-        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        cursor = self.bot.chat_collection.find({"timestamp": {"$gte": start}}).sort("timestamp", 1)
-        
-        log = f"DAILY LOG: {start.date()}\n" + "="*40 + "\n"
-        count = 0
-        async for doc in cursor:
-            name = doc['user_id']
+    async def spyrecent(self, ctx, user_id: Optional[int] = None, since: str = "0d", until: str = None):
+        """!spyrecent [user_id] [since] [until] (defaults to today)"""
+        try: query = {"timestamp": exports.day_range(since, until)}
+        except ValueError: return await ctx.send("❌ Dates are YYYY-MM-DD or like 7d.")
+        if user_id: query["user_id"] = user_id
+        cursor = self.bot.chat_collection.find(query, {"_id": 0, "user_id": 1, "parts": {"$slice": 1}, "timestamp": 1}).sort("timestamp", 1)
+
+        def fmt(doc):
             msg = str(doc['parts'][0]).replace('\n', ' ')
-            log += f"[{doc['timestamp'].strftime('%H:%M')}] {name}: {msg[:50]}\n"
-            count += 1
-            
-        if count == 0: return await ctx.send("❌ No logs today.")
-        await ctx.send(f"Found {count} messages.", file=discord.File(io.BytesIO(log.encode()), filename="daily_log.txt"))
+            return f"[{doc['timestamp'].strftime('%m-%d %H:%M')}] {doc['user_id']}: {msg[:50]}\n"
+
+        header = f"LOG: {since} -> {until or 'now'}" + (f" | user {user_id}" if user_id else "") + "\n" + "="*40 + "\n"
+        if not user_id:
+            # Per-user breakdown from the maintained counters, not from the log itself.
+            top = await self.bot.user_stats.top(query["timestamp"]["$gte"], query["timestamp"].get("$lt"))
+            header += "".join(f"{uid}: {u} msgs, {m} replies\n" for uid, u, m in top) + "="*40 + "\n"
+        await self._send_export(ctx, cursor, fmt, header, "recent_log", "❌ No logs in that range.")
 
     @commands.command()
     @commands.is_owner()
-    async def inbox(self, ctx):
-        cursor = self.bot.feedback_collection.find({}).sort("timestamp", -1)
-        log = "INBOX (Format: [CATEGORY] Name (ID): Message)\n" + "="*50 + "\n"
-        count = 0
-        async for doc in cursor:
-            # Added User ID to the log so you can copy it for !reply
-            log += f"[{doc['category'].upper()}] {doc['username']} ({doc['user_id']}): {doc['message']}\n"
-            count += 1
-        
-        if count == 0: return await ctx.send("📭 Empty.")
-        await ctx.send(f"📬 {count} items.", file=discord.File(io.BytesIO(log.encode()), filename="inbox.txt"))
+    async def inbox(self, ctx, since: str = None, until: str = None):
+        try: timestamps = exports.day_range(since, until)
+        except ValueError: return await ctx.send("❌ Dates are YYYY-MM-DD or like 7d.")
+        cursor = self.bot.feedback_collection.find(
+            {"timestamp": timestamps} if timestamps else {}, {"_id": 0, "category": 1, "username": 1, "user_id": 1, "message": 1}
+        ).sort("timestamp", -1)
+
+        # User ID is in the log so you can copy it for !reply
+        def fmt(doc):
+            return f"[{doc['category'].upper()}] {doc['username']} ({doc['user_id']}): {doc['message']}\n"
+
+        header = "INBOX (Format: [CATEGORY] Name (ID): Message)\n" + "="*50 + "\n"
+        await self._send_export(ctx, cursor, fmt, header, "inbox", "📭 Empty.")
 
     @commands.command(name="reply")
     @commands.is_owner()
@@ -1,15 +1,33 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
 import os
 import io
+import asyncio
 import datetime
-import google.generativeai as genai
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
-from groq import AsyncGroq
+import importlib
+from functools import partial
 import utils
+import limits
+import outbox
+import audio
+import memory
+import metrics
+import scheduler
+from scheduler import LLMScheduler, SchedulerBusy
+from router import Backend, Router
 
 # --- CONFIG ---
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", 0.9))  # fire the backup past this latency percentile
+HEDGE_MIN_MS = float(os.getenv("LLM_HEDGE_MIN_MS", 800))
+STREAM_REPLIES = os.getenv("STREAM_REPLIES", "").lower() in ("1", "true", "yes")
+# Seconds; a stage that misses its budget is dropped. Stages run side by side, so a message
+# waits at most max(budget) on its attachments and then max(budget) on its context.
+STAGE_BUDGETS = {"history": 3.0, "summary": 1.5, "search": 2.5, "image": 5.0, "voice": 10.0}
+KEY_BENCH_SECONDS = 60  # a failing Groq key is skipped (by every cluster) for this long
+SEARCH_TRIGGERS = ["who", "what", "where", "when", "why", "how", "weather", "price", "news", "search"]
+
 SYSTEM_PROMPT = """
 You are **Yuri**, a teenage girl in a Discord chat server.
 You are NOT an AI assistant. You are a chaotic, Gen Z discord member.
@@ -58,16 +76,8 @@ class AI(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         
-        # --- GEMINI SETUP ---
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.safety_settings = {
-            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-        }
-        self.model_1 = genai.GenerativeModel("gemini-1.5-flash", safety_settings=self.safety_settings, system_instruction=SYSTEM_PROMPT)
-        self.model_2 = genai.GenerativeModel("gemini-2.0-flash", safety_settings=self.safety_settings, system_instruction=SYSTEM_PROMPT)
+        # --- GEMINI SETUP (SDK is imported and models built on first use) ---
+        self._models = {}
         
         # --- GROQ MULTI-KEY SETUP ---
         self.groq_keys = []
@@ -80,63 +90,166 @@ class AI(commands.Cog):
             i += 1
             
         self.current_groq_index = 0
+        self._groq_clients = {}  # key index -> AsyncGroq, built on first use
         if self.groq_keys:
-            self.groq_client = AsyncGroq(api_key=self.groq_keys[0])
             print(f"✅ Loaded {len(self.groq_keys)} Groq API Keys.")
         else:
-            self.groq_client = None
             print("❌ No Groq Keys Found!")
 
-        self.cooldowns = {1: None, 2: None}
-        self.fail_counts = {1: 0, 2: 0}
+        self.scheduler = LLMScheduler()
+        self.voice = audio.VoiceNotes(self.transcribe_audio)
 
-    async def _rotate_groq_key(self):
-        """Switches to the next available Groq API Key."""
+        # --- ROUTING (fastest healthy backend first) ---
+        backends = [
+            Backend("gemini-1.5-flash", lambda *a, **kw: self.call_gemini("gemini-1.5-flash", *a, **kw), prior_ms=1500),
+            Backend("gemini-2.0-flash", lambda *a, **kw: self.call_gemini("gemini-2.0-flash", *a, **kw), prior_ms=1800),
+        ]
+        if self.groq_keys:
+            backends.append(Backend("groq", lambda h, *a, **kw: self.call_groq_fallback(h, SYSTEM_PROMPT, *a, **kw), prior_ms=2500))
+        self.router = Router(backends)
+
+        # --- GIFS (resolved off the reply path, pools kept warm) ---
+        self._background = set()
+        for tag in ("anime girl smug", "tohru dragon maid happy"): utils.GIF_TAG_COUNTS[tag] += 1
+        self.gif_warmer.start()
+        self.compactor.start()
+
+        # Import the SDKs in the background so startup doesn't wait on them, and
+        # neither does the first message.
+        self._spawn(asyncio.to_thread(self._preload_sdks))
+
+    def cog_unload(self):
+        self.gif_warmer.cancel()
+        self.compactor.cancel()
+
+    @tasks.loop(seconds=60)
+    async def compactor(self):
+        """Folds old turns into per-user summaries while the LLM lanes are quiet."""
+        for user_id in list(self.bot.summaries.dirty)[:5]:
+            if not self.scheduler.idle(): return
+            try:
+                await self.bot.summaries.compact(user_id, self._summarize)
+            except Exception as e:
+                print(f"Compaction Error ({user_id}): {e}")
+
+    @compactor.before_loop
+    async def before_compactor(self):
+        await self.bot.wait_until_ready()
+
+    async def _summarize(self, old_summary, turns):
+        convo = "\n".join(f"{'YURI' if t['role'] == 'model' else 'USER'}: {t['parts'][0]}" for t in turns)
+        prompt = (
+            "[SYSTEM TASK, not a chat message] Update your private notes about this user.\n"
+            f"CURRENT NOTES: {old_summary or 'none yet'}\n"
+            f"NEW MESSAGES:\n{convo}\n\n"
+            "Reply with ONLY the updated notes: third person, under 120 words, keep facts about them, "
+            "running jokes, beef and anything they asked you to remember. No GIF tags."
+        )
+        return await self.generate([], prompt, priority=scheduler.BACKGROUND)
+
+    @tasks.loop(minutes=20)
+    async def gif_warmer(self):
+        await utils.warm_gif_pools()
+
+    @gif_warmer.before_loop
+    async def before_gif_warmer(self):
+        await self.bot.wait_until_ready()
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    @staticmethod
+    def _preload_sdks():
+        for name in ("google.generativeai", "groq", "duckduckgo_search", "PIL.Image"):
+            try: importlib.import_module(name)
+            except Exception as e: print(f"SDK Preload Error ({name}): {e}")
+
+    def _model(self, name):
+        """Gemini model handle, built on first use."""
+        model = self._models.get(name)
+        if model is None:
+            import google.generativeai as genai
+            from google.generativeai.types import HarmCategory, HarmBlockThreshold
+            if not self._models: genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            safety_settings = {
+                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+            }
+            model = self._models[name] = genai.GenerativeModel(name, safety_settings=safety_settings, system_instruction=SYSTEM_PROMPT)
+        return model
+
+    @property
+    def groq_client(self):
+        """Client for the current Groq key, built on first use."""
+        if not self.groq_keys: return None
+        client = self._groq_clients.get(self.current_groq_index)
+        if client is None:
+            from groq import AsyncGroq
+            client = self._groq_clients[self.current_groq_index] = AsyncGroq(api_key=self.groq_keys[self.current_groq_index])
+        return client
+
+    async def _rotate_groq_key(self, failed=True):
+        """Switches to the next Groq API Key that no cluster has benched (benching this one if it failed)."""
         if len(self.groq_keys) <= 1: return False # No backup keys
-        
-        self.current_groq_index = (self.current_groq_index + 1) % len(self.groq_keys)
-        new_key = self.groq_keys[self.current_groq_index]
-        self.groq_client = AsyncGroq(api_key=new_key)
+        if failed: await self.bot.key_health.bench(self._groq_lane(), KEY_BENCH_SECONDS)
+
+        n = len(self.groq_keys)
+        candidates = [(self.current_groq_index + i) % n for i in range(1, n)]
+        self.current_groq_index = next((i for i in candidates if self.bot.key_health.healthy(f"groq:{i}")), candidates[0])
+        metrics.inc("groq_key_rotations")
         print(f"🔄 Switched to Groq Key #{self.current_groq_index + 1}")
         return True
 
+    def _groq_lane(self):
+        return f"groq:{self.current_groq_index}"
+
     async def transcribe_audio(self, file_bytes, filename):
         """Uses Groq Whisper to transcribe audio (With Retry Logic)."""
-        if not self.groq_client: return None
-        
+        if not self.groq_keys: return None
+        if not self.bot.key_health.healthy(self._groq_lane()): await self._rotate_groq_key(failed=False)
+
         for _ in range(len(self.groq_keys) + 1): # Try current, then iterate backups
             try:
                 audio_file = (filename, file_bytes)
-                transcription = await self.groq_client.audio.transcriptions.create(
-                    file=audio_file,
-                    model="whisper-large-v3",
-                    response_format="json"
-                )
+                async with self.scheduler.slot(self._groq_lane(), scheduler.INTERACTIVE):
+                    with metrics.timer("whisper", key=self.current_groq_index):
+                        transcription = await self.groq_client.audio.transcriptions.create(
+                            file=audio_file,
+                            model="whisper-large-v3",
+                            response_format="json"
+                        )
                 return transcription.text
+            except SchedulerBusy:
+                return None
             except Exception as e:
                 print(f"STT Error (Key #{self.current_groq_index + 1}): {e}")
                 if not await self._rotate_groq_key(): break # Stop if no more keys
         return None
 
-    async def get_combined_response(self, user_id, text_input, image_input=None, prompt_override=None):
-        # 1. Grudge Check
-        is_grudged = await self.bot.grudge_collection.find_one({"user_id": user_id})
+    async def get_combined_response(self, user_id, text_input, image_input=None, prompt_override=None, priority=scheduler.COMMAND, on_text=None):
+        # 1. Grudge Check (in memory)
+        is_grudged = self.bot.settings.is_grudged(user_id)
         grudge_prompt = "\n[SYSTEM: You hold a grudge against this user. Be cold/dismissive.]" if is_grudged else ""
 
-        # 2. History & Time
-        cursor = self.bot.chat_collection.find({"user_id": user_id}).sort("timestamp", 1).limit(25)
-        history_db = [{"role": doc["role"], "parts": doc["parts"]} async for doc in cursor]
-        
+        # 2. Context Assembly: history, summary & web search run side by side, each under its own budget
+        wants_search = bool(text_input and not prompt_override and any(word in text_input.lower() for word in SEARCH_TRIGGERS))
+        history_db, summary, web_results = await asyncio.gather(
+            self._stage("history", self.bot.memory.get_history(user_id)),
+            self._stage("summary", self.bot.summaries.get(user_id)),
+            self._stage("search", utils.search_web(text_input)) if wants_search else utils.noop(),
+        )
+        # Summary + every turn newer than it, under the history token budget.
+        history_db = memory.fit_history(history_db or [], summary, self.bot.summaries.until(user_id))
+        search_data = web_results or ""
+        notes_prompt = f"\n[SYSTEM: Your notes on this user from older chats: {summary}]" if summary else ""
+
+        # 3. Time
         time_str = utils.get_smart_time(text_input if text_input else "")
-        system_data = f"[System: Current Date/Time is {time_str}. Do not mention this unless asked.]{grudge_prompt}"
-
-        # 3. Web Search
-        search_data = ""
-        if text_input and not prompt_override:
-            triggers = ["who", "what", "where", "when", "why", "how", "weather", "price", "news", "search"]
-            if any(word in text_input.lower() for word in triggers):
-                web_results = await utils.search_web(text_input)
-                if web_results: search_data = web_results
+        system_data = f"[System: Current Date/Time is {time_str}. Do not mention this unless asked.]{grudge_prompt}{notes_prompt}"
 
         # 4. Construct Prompt
         current_text = f"{system_data}\n{search_data}\n\n"
@@ -147,52 +260,132 @@ class AI(commands.Cog):
             if text_input: current_text += text_input
             if image_input: current_text += " (User sent an image. Roast it or comment on it.)"
 
-        # 5. Generation Loop (Gemini Layers)
-        response_text = ""
-        successful = False
-        now = datetime.datetime.now()
-        
-        for layer in self.cooldowns:
-            if self.cooldowns[layer] and now > self.cooldowns[layer]: self.cooldowns[layer] = None
-
-        models = [(self.model_1, 1), (self.model_2, 2)]
-        
-        for model, layer in models:
-            if successful: break
-            if not self.cooldowns[layer]:
-                try:
-                    gemini_history = history_db + [{"role": "user", "parts": [current_text]}]
-                    if image_input: gemini_history[-1]["parts"].append(image_input)
-                    
-                    response = await model.generate_content_async(gemini_history)
-                    response_text = response.text
-                    successful = True
-                    self.fail_counts[layer] = 0
-                except Exception as e:
-                    print(f"Gemini {layer} Error: {e}")
-                    self.fail_counts[layer] += 1
-                    wait = datetime.timedelta(minutes=1) if self.fail_counts[layer] < 2 else datetime.timedelta(hours=24)
-                    self.cooldowns[layer] = now + wait
-
-        # 6. Fallback (Groq Multi-Key Rotation)
-        if not successful:
-            response_text = await self.call_groq_fallback(history_db, SYSTEM_PROMPT, current_text, image_input)
+        # 5. Generation (healthiest backend first, next one on failure)
+        try:
+            response_text = await self.generate(history_db, current_text, image_input, priority, on_text=on_text)
+        except SchedulerBusy:
+            response_text = "too many ppl yapping at me rn 😵 try again in a sec"
+        except Exception:
+            response_text = "The AI is **down** rn, try again in a bit."
 
         # 7. Process & Save
-        clean_text, gif_url = await utils.process_gif_tags(response_text)
+        clean_text, gif_query = utils.extract_gif_tag(response_text)
         
         if not prompt_override:
             user_save = text_input if text_input else "[Image]"
-            model_save = clean_text if clean_text else f"[GIF: {gif_url}]"
+            model_save = clean_text if clean_text else f"[GIF: {gif_query}]"
             timestamp = datetime.datetime.utcnow()
-            await self.bot.chat_collection.insert_one({"user_id": user_id, "role": "user", "parts": [user_save], "timestamp": timestamp})
-            await self.bot.chat_collection.insert_one({"user_id": user_id, "role": "model", "parts": [model_save], "timestamp": timestamp})
+            self.bot.memory.save_turns(user_id, [
+                {"user_id": user_id, "role": "user", "parts": [user_save], "timestamp": timestamp},
+                {"user_id": user_id, "role": "model", "parts": [model_save], "timestamp": timestamp},
+            ])
+            self.bot.summaries.touch(user_id, 2)
             
-        return clean_text, gif_url
+        return clean_text, gif_query
 
-    async def call_groq_fallback(self, history, sys_prompt, msg, img=None):
-        """Tries Groq (70B -> 8B -> Rotate Key -> Retry)."""
-        if not self.groq_client: return "Server dead rn. Try later."
+    async def _stage(self, name, coro):
+        """Awaits one context stage within its budget, recording how long it took."""
+        try:
+            with metrics.timer("context_stage", stage=name):
+                return await asyncio.wait_for(coro, STAGE_BUDGETS[name])
+        except asyncio.TimeoutError:
+            metrics.inc("context_stage_timeouts", stage=name)
+            print(f"⏱️ {name} missed its {STAGE_BUDGETS[name]}s budget, skipping it.")
+            return None
+        except Exception as e:
+            print(f"{name} Stage Error: {e}")
+            return None
+
+    def _hedge_delay(self, backend):
+        observed = backend.percentile(HEDGE_PERCENTILE) if len(backend.samples) >= 10 else backend.prior_ms
+        return max(HEDGE_MIN_MS, observed) / 1000
+
+    async def generate(self, history, msg, img=None, priority=scheduler.COMMAND, on_text=None):
+        """Runs the prompt on the healthiest backend, falling through the ranking on errors.
+
+        With LLM_HEDGE on, a request that outlives the primary's usual latency also
+        starts the next backend; the first answer wins and the other is cancelled.
+        Passing on_text streams instead (called with the text so far), which disables hedging.
+        Raises SchedulerBusy if everything was saturated, RuntimeError if everything failed.
+        """
+        ranked = self.router.ranked()
+        hedge = HEDGE_ENABLED and priority <= scheduler.COMMAND and not on_text
+        pending = {}
+        hedged = None
+        saturated = False
+        nxt = 0
+
+        def launch():
+            nonlocal nxt
+            backend = ranked[nxt]
+            nxt += 1
+            pending[asyncio.create_task(self.router.call(backend, history, msg, img, priority, on_text=on_text))] = backend
+
+        try:
+            while pending or nxt < len(ranked):
+                if not pending: launch()
+                timeout = None
+                if hedge and not hedged and len(pending) == 1 and nxt < len(ranked):
+                    timeout = self._hedge_delay(next(iter(pending.values())))
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Primary is slower than usual: race the next backend against it.
+                    hedged = ranked[nxt]
+                    metrics.inc("llm_hedges", outcome="fired")
+                    launch()
+                    continue
+
+                for task in done:
+                    backend = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except SchedulerBusy:
+                        saturated = True # Busy, not broken: try the next backend
+                        continue
+                    except Exception as e:
+                        print(f"{backend.name} Error: {e}")
+                        continue
+                    if backend is hedged: metrics.inc("llm_hedges", outcome="won")
+                    elif backend is not ranked[0]: metrics.inc("llm_fallbacks", to=backend.name)
+                    return result
+        finally:
+            for task in pending: task.cancel()
+
+        if saturated: raise SchedulerBusy("all backends")
+        raise RuntimeError("All backends failed")
+
+    async def call_gemini(self, model_name, history, msg, img=None, priority=scheduler.COMMAND, on_text=None):
+        model = self._model(model_name)
+        gemini_history = history + [{"role": "user", "parts": [msg]}]
+        if img: gemini_history[-1]["parts"].append(img)
+        async with self.scheduler.slot("gemini", priority):
+            if not on_text:
+                response = await model.generate_content_async(gemini_history)
+                return response.text
+            response = await model.generate_content_async(gemini_history, stream=True)
+            text = ""
+            async for chunk in response:
+                text += chunk.text
+                await on_text(text)
+            return text
+
+    async def _groq_complete(self, model, messages, priority, on_text=None):
+        async with self.scheduler.slot(self._groq_lane(), priority):
+            with metrics.timer("groq_call", key=self.current_groq_index, model=model):
+                if not on_text:
+                    comp = await self.groq_client.chat.completions.create(model=model, messages=messages, max_tokens=256)
+                    return comp.choices[0].message.content
+                stream = await self.groq_client.chat.completions.create(model=model, messages=messages, max_tokens=256, stream=True)
+                text = ""
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        text += chunk.choices[0].delta.content
+                        await on_text(text)
+                return text
+
+    async def call_groq_fallback(self, history, sys_prompt, msg, img=None, priority=scheduler.COMMAND, on_text=None):
+        """Tries Groq (70B -> 8B -> Rotate Key -> Retry). Raises if every key fails."""
 
         messages = [{"role": "system", "content": sys_prompt}]
         for m in history:
@@ -201,21 +394,28 @@ class AI(commands.Cog):
             if isinstance(content, str): messages.append({"role": role, "content": content})
         messages.append({"role": "user", "content": msg})
 
+        # Another cluster may have benched our key since the last call.
+        if not self.bot.key_health.healthy(self._groq_lane()): await self._rotate_groq_key(failed=False)
+
         # Retry Loop for Key Rotation
+        busy = 0
         for _ in range(len(self.groq_keys) + 1):
             try:
                 # 1. Try Big Model (70B) or Vision (11B)
                 model = "llama-3.2-11b-vision-preview" if img else "llama-3.3-70b-versatile"
-                comp = await self.groq_client.chat.completions.create(model=model, messages=messages, max_tokens=256)
-                return comp.choices[0].message.content
+                return await self._groq_complete(model, messages, priority, on_text)
+            except SchedulerBusy:
+                # This key is saturated; try the next one without treating it as dead.
+                busy += 1
+                if busy >= len(self.groq_keys) or not await self._rotate_groq_key(failed=False):
+                    raise
             except Exception as e:
                 print(f"Groq 70B Failed (Key {self.current_groq_index + 1}): {e}")
                 
                 # 2. Try Small Model (8B) - Only if NOT an image (8B is text only)
                 if not img:
                     try:
-                        comp = await self.groq_client.chat.completions.create(model="llama-3.1-8b-instant", messages=messages, max_tokens=256)
-                        return comp.choices[0].message.content
+                        return await self._groq_complete("llama-3.1-8b-instant", messages, priority, on_text)
                     except Exception as e2:
                         print(f"Groq 8B Failed (Key {self.current_groq_index + 1}): {e2}")
 
@@ -223,7 +423,7 @@ class AI(commands.Cog):
                 if not await self._rotate_groq_key():
                     break # Stop if we ran out of keys
 
-        return "The AI is **down** rn, wait for about **12 hours** (Rate Limits reached)."
+        raise RuntimeError("All Groq keys failed")
 
     @commands.Cog.listener()
     async def on_message(self, message):
@@ -232,43 +432,76 @@ class AI(commands.Cog):
         is_reply = (message.reference and message.reference.resolved and message.reference.resolved.author == self.bot.user)
         
         if self.bot.user.mentioned_in(message) or is_reply:
+            # Over budget: one cheap canned reply per cooldown, no DB or LLM work.
+            wait, scope = self.bot.limiter.check(message.author.id, message.guild.id if message.guild else None)
+            if wait:
+                if self.bot.limiter.should_warn(message.author.id, wait):
+                    try: await message.reply(limits.canned(wait, scope), mention_author=False)
+                    except Exception as e: print(f"Rate Limit Reply Error: {e}")
+                return
+
             try:
                 async with message.channel.typing():
                     user_id = message.author.id
                     clean_text = message.content.replace(f'<@{self.bot.user.id}>', '').strip()
-                    img_data = None
-                    voice_text = ""
-
-                    for att in message.attachments:
-                        filename = att.filename.lower()
-                        if not img_data and any(filename.endswith(x) for x in ['png', 'jpg', 'jpeg', 'webp']):
-                            img_data = await utils.get_image_from_url(att.url)
-                        elif not voice_text and any(filename.endswith(x) for x in ['ogg', 'mp3', 'wav', 'm4a']):
-                            file_bytes = await att.read()
-                            transcribed = await self.transcribe_audio(file_bytes, filename)
-                            if transcribed: voice_text = f"\n[User Voice Note]: \"{transcribed}\""
+                    img_data, transcribed = await self._read_attachments(message.attachments)
+                    voice_text = f"\n[User Voice Note]: \"{transcribed}\"" if transcribed else ""
 
                     final_text = clean_text + voice_text
                     if not final_text.strip() and not img_data: return
 
-                    resp_text, gif_url = await self.get_combined_response(user_id, final_text, img_data)
-
-                    await utils.send_chunked_reply(message, resp_text, mention_user=True)
-                    if gif_url:
-                        embed = discord.Embed(color=discord.Color.from_rgb(255, 105, 180))
-                        embed.set_image(url=gif_url)
-                        await message.channel.send(embed=embed)
+                    if STREAM_REPLIES:
+                        stream = utils.StreamingReply(message, mention_user=True)
+                        resp_text, gif_query = await self.get_combined_response(user_id, final_text, img_data, priority=scheduler.INTERACTIVE, on_text=stream.feed)
+                        embed = self._gif_embed(gif_query)
+                        await stream.finish(resp_text, embed=embed)
+                        sent = stream.sent
+                    else:
+                        resp_text, gif_query = await self.get_combined_response(user_id, final_text, img_data, priority=scheduler.INTERACTIVE)
+                        embed = self._gif_embed(gif_query)
+                        sent = await utils.send_chunked_reply(message, resp_text, mention_user=True, embed=embed)
+
+                    # A GIF whose pool wasn't cached yet gets edited onto the text once it resolves.
+                    if gif_query and embed is None: self._spawn(self._attach_gif(message, sent[-1] if sent else None, gif_query))
             except Exception as e:
                 print(f"Error: {e}")
 
+    async def _read_attachments(self, attachments):
+        """Downloads the first image and transcribes the first voice note side by side -> (image, transcript)."""
+        image = next((a for a in attachments if a.filename.lower().endswith(utils.IMAGE_EXTENSIONS)), None)
+        voice = next((a for a in attachments if a.filename.lower().endswith(audio.AUDIO_EXTENSIONS)), None)
+        if not image and not voice: return None, None
+        return await asyncio.gather(
+            self._stage("image", utils.get_image_from_url(self.bot.session, image.url)) if image else utils.noop(),
+            self._stage("voice", self.voice.transcript(voice)) if voice else utils.noop(),
+        )
+
+    @staticmethod
+    def _gif_embed(query=None, url=None):
+        """Embed for url, or for query if its GIF pool is already cached; else None."""
+        url = url or (query and utils.cached_gif(query))
+        if not url: return None
+        embed = discord.Embed(color=discord.Color.from_rgb(255, 105, 180))
+        embed.set_image(url=url)
+        return embed
+
+    async def _attach_gif(self, message, reply, query):
+        gif_url = await utils.search_gif_ddg(query)
+        if not gif_url: return
+        embed = self._gif_embed(url=gif_url)
+        call = partial(reply.edit, embed=embed) if reply else partial(message.channel.send, embed=embed)
+        await outbox.send(message.channel.id, "gif", call)
+
     @app_commands.command(name="ask", description="Ask Yuri a Yes/No question.")
     async def ask(self, interaction: discord.Interaction, question: str):
+        if await limits.deny(self.bot.limiter, interaction): return
         await interaction.response.defer()
         response, _ = await self.get_combined_response(interaction.user.id, None, prompt_override=f"Answer this yes/no question sassily: {question}")
         await utils.send_chunked_reply(interaction, f"**Q:** {question}\n**A:** {response}")
 
     @app_commands.command(name="rename", description="Give someone a chaotic nickname.")
     async def rename(self, interaction: discord.Interaction, member: discord.Member):
+        if await limits.deny(self.bot.limiter, interaction): return
         await interaction.response.defer()
         if interaction.guild.me.top_role <= member.top_role:
             await interaction.followup.send("They are too powerful (Role Hierarchy).")
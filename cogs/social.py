@@ -1,24 +1,55 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
 import utils
-import asyncio
+import limits
+import scheduler
 import datetime
 from typing import Optional
 
 class Social(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.pool_refill.start()
+
+    def cog_unload(self):
+        self.pool_refill.cancel()
 
     async def get_ai_cog(self):
         return self.bot.get_cog("AI")
 
+    @tasks.loop(seconds=30)
+    async def pool_refill(self):
+        """Tops up the /truth and /dare pools, but only while the LLM lanes have spare room."""
+        if self.bot.cluster_id != 0: return  # the pool is shared; one cluster keeps it stocked
+        if self.bot.clustered: await self.bot.content_pool.load()  # other clusters pop from it too
+        ai = await self.get_ai_cog()
+        kind = self.bot.content_pool.neediest()
+        if not ai or not kind or not ai.scheduler.idle(): return
+        try:
+            await self.bot.content_pool.refill(kind, lambda prompt: ai.generate([], prompt, priority=scheduler.BACKGROUND))
+        except Exception as e:
+            print(f"Pool Refill Error ({kind}): {e}")
+
+    @pool_refill.before_loop
+    async def before_pool_refill(self):
+        await self.bot.wait_until_ready()
+
+    async def _pooled(self, interaction, kind, prompt):
+        """A pre-generated entry if one is in stock, otherwise a live generation."""
+        text = await self.bot.content_pool.pop(kind)
+        if text: return text
+        ai = await self.get_ai_cog()
+        resp, _ = await ai.get_combined_response(interaction.user.id, None, prompt_override=prompt, priority=scheduler.BACKGROUND)
+        return resp
+
     @app_commands.command(name="roast", description="DESTROY someone based on history.")
     async def roast(self, interaction: discord.Interaction, member: discord.Member):
+        if await limits.deny(self.bot.limiter, interaction): return
         await interaction.response.defer()
         dossier = utils.get_user_dossier(member)
         history = await utils.get_user_history_text(self.bot.chat_collection, member.id)
-        pfp = await utils.get_image_from_url(member.display_avatar.url) if member.display_avatar else None
+        pfp = await utils.get_avatar(self.bot.session, self.bot.avatar_cache, member.display_avatar)
         
         prompt = (f"TARGET:\n{dossier}\nRECENT CHATS:\n{history}\n"
                   f"INSTRUCTION: Roast them based on PFP and chat history. Call them out on things they said. Be brutal.")
@@ -29,10 +60,11 @@ class Social(commands.Cog):
 
     @app_commands.command(name="rate", description="Judge vibe based on chat history.")
     async def rate(self, interaction: discord.Interaction, member: discord.Member):
+        if await limits.deny(self.bot.limiter, interaction): return
         await interaction.response.defer()
         dossier = utils.get_user_dossier(member)
         history = await utils.get_user_history_text(self.bot.chat_collection, member.id)
-        pfp = await utils.get_image_from_url(member.display_avatar.url) if member.display_avatar else None
+        pfp = await utils.get_avatar(self.bot.session, self.bot.avatar_cache, member.display_avatar)
         
         prompt = (f"TARGET:\n{dossier}\nRECENT CHATS:\n{history}\n"
                   f"INSTRUCTION: Rate vibe (0-100%). If they are funny/nice in chats, give high score. If dry/rude, destroy them.")
@@ -43,6 +75,7 @@ class Social(commands.Cog):
 
     @app_commands.command(name="ship", description="Check compatibility.")
     async def ship(self, interaction: discord.Interaction, member1: discord.Member, member2: Optional[discord.Member] = None):
+        if await limits.deny(self.bot.limiter, interaction): return
         await interaction.response.defer()
         target2 = member2 if member2 else interaction.user
         
@@ -51,12 +84,8 @@ class Social(commands.Cog):
         d2 = utils.get_user_dossier(target2)
         h2 = await utils.get_user_history_text(self.bot.chat_collection, target2.id, limit=10)
         
-        combined_img = None
-        if member1.display_avatar and target2.display_avatar:
-            img1 = await utils.get_image_from_url(member1.display_avatar.url)
-            img2 = await utils.get_image_from_url(target2.display_avatar.url)
-            if img1 and img2:
-                combined_img = await asyncio.to_thread(utils.stitch_images, img1, img2)
+        combined_img = await utils.get_ship_image(self.bot.session, self.bot.avatar_cache, self.bot.ship_cache,
+                                                  member1.display_avatar, target2.display_avatar)
 
         prompt = (f"USER 1:\n{d1}\nCHATS:\n{h1}\n\nUSER 2:\n{d2}\nCHATS:\n{h2}\n"
                   f"INSTRUCTION: Check compatibility. Analyze chat styles. Give % Score.")
@@ -68,7 +97,7 @@ class Social(commands.Cog):
     @app_commands.command(name="confess", description="Send an anonymous confession.")
     async def confess(self, interaction: discord.Interaction, message: str):
         await interaction.response.defer(ephemeral=True)
-        config = await self.bot.config_collection.find_one({"guild_id": interaction.guild_id})
+        config = self.bot.settings.get_config(interaction.guild_id)
         
         if not config or "confession_channel_id" not in config:
             await interaction.followup.send("❌ Admin must run `/setup` first!", ephemeral=True)
@@ -107,16 +136,16 @@ class Social(commands.Cog):
 
     @app_commands.command(name="truth", description="Get a spicy Truth question.")
     async def truth(self, interaction: discord.Interaction):
+        if await limits.deny(self.bot.limiter, interaction): return
         await interaction.response.defer()
-        ai = await self.get_ai_cog()
-        resp, _ = await ai.get_combined_response(interaction.user.id, None, prompt_override="Give a funny, spicy teenage Truth question.")
+        resp = await self._pooled(interaction, "truth", "Give a funny, spicy teenage Truth question.")
         await utils.send_chunked_reply(interaction, f"**TRUTH:** {resp}")
 
     @app_commands.command(name="dare", description="Get a chaotic Dare.")
     async def dare(self, interaction: discord.Interaction):
+        if await limits.deny(self.bot.limiter, interaction): return
         await interaction.response.defer()
-        ai = await self.get_ai_cog()
-        resp, _ = await ai.get_combined_response(interaction.user.id, None, prompt_override="Give a funny, chaotic Dare for a discord user.")
+        resp = await self._pooled(interaction, "dare", "Give a funny, chaotic Dare for a discord user.")
         await utils.send_chunked_reply(interaction, f"**DARE:** {resp}")
 
 async def setup(bot):
@@ -0,0 +1,57 @@
+import re
+import gzip
+import asyncio
+import datetime
+import tempfile
+import metrics
+
+# --- CONFIG ---
+EXPORT_BATCH = 2000                 # cursor batch size, and lines per compressed write
+SPOOL_MAX = 8 * 1024 * 1024         # exports stay in RAM up to this, then spill to a temp file
+UPLOAD_LIMIT = 10 * 1024 * 1024     # Discord's attachment cap in unboosted servers
+RELATIVE_DAY = re.compile(r"^(\d+)d$")
+
+
+def parse_day(arg):
+    """'YYYY-MM-DD' or '<n>d' (n days ago) -> midnight UTC of that day. Raises ValueError."""
+    today = datetime.datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    match = RELATIVE_DAY.match(arg.lower())
+    if match: return today - datetime.timedelta(days=int(match.group(1)))
+    return datetime.datetime.strptime(arg, "%Y-%m-%d")
+
+
+def day_range(since=None, until=None):
+    """Mongo timestamp filter for [since, until], both inclusive days; {} if neither is given."""
+    query = {}
+    if since: query["$gte"] = parse_day(since)
+    if until: query["$lt"] = parse_day(until) + datetime.timedelta(days=1)
+    return query
+
+
+async def export(cursor, fmt, header=""):
+    """Streams cursor through fmt(doc) -> line into a gzipped spooled file.
+
+    Returns (file, lines, compressed bytes) with the file rewound; the caller
+    closes it. Compression runs in a thread one batch at a time, so neither
+    the loop nor memory scales with the size of the export.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX)
+    try:
+        gz = gzip.GzipFile(fileobj=spool, mode="wb", compresslevel=6)
+        lines = [header] if header else []
+        count = 0
+        with metrics.timer("export"):
+            async for doc in cursor.batch_size(EXPORT_BATCH):
+                lines.append(fmt(doc))
+                count += 1
+                if len(lines) >= EXPORT_BATCH:
+                    await asyncio.to_thread(gz.write, "".join(lines).encode())
+                    lines = []
+            if lines: await asyncio.to_thread(gz.write, "".join(lines).encode())
+            gz.close()
+    except BaseException:
+        spool.close()
+        raise
+    size = spool.tell()
+    spool.seek(0)
+    return spool, count, size
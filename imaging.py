@@ -0,0 +1,95 @@
+import io
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import metrics
+
+# --- CONFIG ---
+MODEL_IMAGE_SIDE = int(os.getenv("MODEL_IMAGE_SIDE", 768))  # Gemini tiles at 768px; more is wasted upload
+JPEG_QUALITY = 85
+MAX_IMAGE_PIXELS = 40_000_000  # refuse to decode anything bigger (decompression bombs)
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))  # 0 = run on the default thread pool instead
+
+_pool = None
+
+
+# --- WORKERS (run in the process pool, so plain bytes in and out; PIL is only imported there) ---
+def _encode(img):
+    """Flattens to RGB and encodes as a Gemini inline-data part."""
+    from PIL import Image
+    if img.mode in ("P", "LA"): img = img.convert("RGBA")
+    if img.mode == "RGBA":
+        flat = Image.new("RGB", img.size, (255, 255, 255))
+        flat.paste(img, mask=img.getchannel("A"))
+        img = flat
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True)
+    return {"mime_type": "image/jpeg", "data": buf.getvalue()}
+
+def _open(data, max_side):
+    from PIL import Image
+    # JPEGs are DCT-scaled by draft(), so the full-resolution bitmap never exists in memory.
+    img = Image.open(io.BytesIO(data))
+    if img.width * img.height > MAX_IMAGE_PIXELS: return None
+    img.draft("RGB", (max_side, max_side))
+    img.thumbnail((max_side, max_side))
+    return img
+
+def prepare_image(data, max_side=MODEL_IMAGE_SIDE):
+    img = _open(data, max_side)
+    return _encode(img) if img else None
+
+def stitch_images(data1, data2, height=MODEL_IMAGE_SIDE // 2):
+    """Two encoded images side by side at the same height, encoded."""
+    from PIL import Image
+    img1, img2 = _open(data1, MODEL_IMAGE_SIDE), _open(data2, MODEL_IMAGE_SIDE)
+    if not img1 or not img2: return None
+    w1 = int(img1.width * height / img1.height)
+    w2 = int(img2.width * height / img2.height)
+    canvas = Image.new("RGB", (w1 + w2, height))
+    canvas.paste(img1.convert("RGB").resize((w1, height), Image.Resampling.LANCZOS), (0, 0))
+    canvas.paste(img2.convert("RGB").resize((w2, height), Image.Resampling.LANCZOS), (w1, 0))
+    canvas.thumbnail((MODEL_IMAGE_SIDE, MODEL_IMAGE_SIDE))
+    return _encode(canvas)
+
+
+# --- ASYNC FRONT ---
+def _executor():
+    global _pool
+    if _pool is None and IMAGE_WORKERS > 0:
+        # Not fork: by now motor and the thread pools have live threads, and a forked child can inherit a held lock.
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+    return _pool
+
+async def run(fn, *args):
+    """Runs an image worker off the event loop (and off the GIL); None if it fails."""
+    global _pool
+    loop = asyncio.get_running_loop()
+    try:
+        with metrics.timer("image_work", op=fn.__name__):
+            try:
+                return await loop.run_in_executor(_executor(), fn, *args)
+            except BrokenProcessPool:
+                # A worker died (OOM-killed, usually); start a fresh pool next time.
+                print("⚠️ Image pool broke, restarting it.")
+                shutdown()
+                return await loop.run_in_executor(None, fn, *args)
+    except Exception as e:
+        print(f"Image Error ({fn.__name__}): {e}")
+        return None
+
+async def prepare(data, max_side=MODEL_IMAGE_SIDE):
+    """Raw image bytes -> JPEG part no bigger than the model can use."""
+    return await run(prepare_image, data, max_side)
+
+async def stitch(part1, part2):
+    return await run(stitch_images, part1["data"], part2["data"])
+
+def shutdown():
+    global _pool
+    if _pool: _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
@@ -0,0 +1,128 @@
+import os
+import time
+import random
+from collections import Counter
+import metrics
+
+# --- CONFIG ("burst/seconds": up to burst requests, refilled evenly over that many seconds) ---
+def _parse(spec):
+    if not spec or spec.lower() in ("0", "off", "none"): return None
+    burst, per = spec.split("/")
+    return float(burst), float(per)
+
+RATE_USER = _parse(os.getenv("RATE_LIMIT_USER", "6/60"))
+RATE_GUILD = _parse(os.getenv("RATE_LIMIT_GUILD", "40/60"))
+RATE_GLOBAL = _parse(os.getenv("RATE_LIMIT_GLOBAL", "240/60"))
+MAX_BUCKETS = 5000  # per scope; idle (full) buckets are dropped past this
+
+CANNED = {  # by the scope that ran dry; only "user" blames the person asking
+    "user": [
+        "slow down bestie 😭 my brain needs {s}s",
+        "ur yapping faster than i can read. {s}s cooldown 💀",
+        "nah ur on timeout for {s}s 🙄",
+        "bro i'm literally one girl. try again in {s}s",
+    ],
+    "guild": [
+        "this server has me booked rn 😵 try again in {s}s",
+        "too many of y'all at once. back in {s}s 💅",
+    ],
+    "global": [
+        "i'm getting swarmed everywhere rn 😭 try again in {s}s",
+        "brain's at capacity, not ur fault. give me {s}s 💀",
+    ],
+}
+
+
+def canned(wait, scope="user"):
+    return random.choice(CANNED[scope]).format(s=max(1, round(wait)))
+
+
+class TokenBucket:
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity, per, now):
+        self.capacity = capacity
+        self.rate = capacity / per
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def wait(self):
+        """Seconds until a whole token is available."""
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """Per-user, per-guild and global token buckets in front of the AI pipeline.
+
+    A request spends one token from each bucket it falls under, or nothing
+    at all if any of them is empty. Scopes configured as None are unlimited.
+    """
+
+    def __init__(self, user=RATE_USER, guild=RATE_GUILD, global_=RATE_GLOBAL, exempt=()):
+        self.limits = {"user": user, "guild": guild, "global": global_}
+        self.buckets = {scope: {} for scope in self.limits}
+        self.exempt = set(exempt)
+        self.allowed = 0
+        self.limited = Counter()
+        self._warned = {}  # user_id -> monotonic time until which they don't get another canned reply
+
+    def _bucket(self, scope, key, now):
+        limit = self.limits[scope]
+        if not limit or key is None: return None
+        buckets = self.buckets[scope]
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) >= MAX_BUCKETS: self._prune(buckets, now)
+            bucket = buckets[key] = TokenBucket(*limit, now)
+        bucket.refill(now)
+        return bucket
+
+    @staticmethod
+    def _prune(buckets, now):
+        for key in [k for k, b in buckets.items() if b.refill(now) >= b.capacity]:
+            del buckets[key]
+
+    def check(self, user_id, guild_id=None):
+        """Spends a token for this request -> (0, None), or (seconds until it could go
+        through, the scope that's out) with nothing spent."""
+        if user_id in self.exempt: return 0, None
+        now = time.monotonic()
+        scoped = [(scope, self._bucket(scope, key, now)) for scope, key in (("user", user_id), ("guild", guild_id), ("global", "all"))]
+        scoped = [(scope, bucket) for scope, bucket in scoped if bucket]
+        short = [(bucket.wait(), scope) for scope, bucket in scoped if bucket.tokens < 1]
+        if short:
+            wait, scope = max(short)
+            self.limited[scope] += 1
+            metrics.inc("rate_limited", scope=scope)
+            return wait, scope
+        for _, bucket in scoped: bucket.tokens -= 1
+        self.allowed += 1
+        return 0, None
+
+    def should_warn(self, user_id, wait):
+        """True once per limited stretch, so a spammer gets one canned reply instead of one per message."""
+        now = time.monotonic()
+        if self._warned.get(user_id, 0) > now: return False
+        if len(self._warned) > MAX_BUCKETS:
+            self._warned = {k: t for k, t in self._warned.items() if t > now}
+        self._warned[user_id] = now + wait
+        return True
+
+    def lowest(self, scope, n=5):
+        """[(key, tokens, capacity)] for the emptiest buckets of a scope."""
+        now = time.monotonic()
+        ranked = sorted((b.refill(now), key, b.capacity) for key, b in self.buckets[scope].items())
+        return [(key, tokens, capacity) for tokens, key, capacity in ranked[:n]]
+
+
+async def deny(limiter, interaction):
+    """For slash commands: True (after an ephemeral canned reply) if the user is over budget."""
+    wait, scope = limiter.check(interaction.user.id, interaction.guild_id)
+    if not wait: return False
+    await interaction.response.send_message(canned(wait, scope), ephemeral=True)
+    return True
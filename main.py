@@ -1,14 +1,65 @@
 import discord
 from discord.ext import commands
 import os
+import json
+import time
+import signal
 import asyncio
+import multiprocessing
+import urllib.request
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
+from memory import ChatMemory, ChatWriter, ChatSummaries, ActivityStats
+from state import SettingsCache, KeyHealth
+from pools import ContentPool
+import limits
+import utils
+import imaging
+import metrics
 
 load_dotenv()
 
-class YuriBot(commands.Bot):
-    def __init__(self):
+# --- CLUSTER MODE ---
+# CLUSTER_COUNT > 1 splits the shards across that many processes. Without CLUSTER_ID,
+# `python main.py` spawns and supervises all of them; with it (one dyno per cluster,
+# see Procfile) the process runs just that cluster. SHARD_COUNT defaults to Discord's
+# recommendation, except with CLUSTER_ID, where it must be pinned (at or above the
+# recommendation) so every dyno splits the same range. Scale `worker` to 0 when running
+# the clusterN dynos: it would open a second gateway session for the same shards and
+# every message would get two replies.
+CLUSTER_COUNT = int(os.getenv("CLUSTER_COUNT", 1))
+CLUSTER_ID = os.getenv("CLUSTER_ID")
+SHARD_COUNT = os.getenv("SHARD_COUNT")
+STATE_POLL_INTERVAL = 15   # seconds between re-reads of state other clusters may have written
+CLUSTER_HISTORY_MAX_AGE = 60  # seconds a cached history window is trusted in cluster mode
+
+def recommended_shards(token):
+    req = urllib.request.Request("https://discord.com/api/v10/gateway/bot", headers={"Authorization": f"Bot {token}"})
+    with urllib.request.urlopen(req, timeout=10) as resp:
+        return json.load(resp)["shards"]
+
+def cluster_shards(cluster_id, cluster_count, shard_count):
+    """The contiguous shard range owned by one cluster."""
+    per = -(-shard_count // cluster_count)
+    return list(range(cluster_id * per, min(shard_count, (cluster_id + 1) * per)))
+
+async def timed(timings, name, coro):
+    """Awaits coro, recording its wall time under timings[name] (ms)."""
+    start = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        timings[name] = (time.perf_counter() - start) * 1000
+        metrics.observe("startup", timings[name], stage=name)
+
+@commands.command()
+@commands.is_owner()
+async def sync(ctx):
+    synced = await ctx.bot.tree.sync()
+    await ctx.send(f"Synced {len(synced)} slash commands.")
+
+class YuriBot(commands.AutoShardedBot):
+    def __init__(self, cluster_id=None, shard_ids=None, shard_count=None):
         intents = discord.Intents.default()
         intents.message_content = True
         intents.members = True
@@ -16,11 +67,24 @@ class YuriBot(commands.Bot):
             command_prefix='!',
             intents=intents,
             help_command=None,
-            activity=discord.Activity(type=discord.ActivityType.listening, name="startup...")
+            activity=discord.Activity(type=discord.ActivityType.listening, name="startup..."),
+            shard_ids=shard_ids,
+            shard_count=shard_count,
         )
         self.owner_id = int(os.getenv("OWNER_ID"))
+        self.cluster_id = cluster_id or 0
+        self.clustered = cluster_id is not None
+        self.started = time.perf_counter()
+        self.add_command(sync)
 
     async def setup_hook(self):
+        timings = {}
+
+        # Shared HTTP
+        self.session = utils.create_http_session()
+        self.avatar_cache = utils.ImageCache()
+        self.ship_cache = utils.ImageCache(16 * 1024 * 1024)
+
         # Database Setup
         mongo_url = os.getenv("MONGO_URL")
         if not mongo_url:
@@ -36,29 +100,166 @@ class YuriBot(commands.Bot):
         self.crush_collection = self.db["crushes"]
         self.grudge_collection = self.db["grudges"]
         self.feedback_collection = self.db["feedback"]
+        self.pool_collection = self.db["content_pool"]
+        self.summary_collection = self.db["chat_summaries"]
+        self.stats_collection = self.db["user_stats"]
+        self.user_stats = ActivityStats(self.stats_collection)
+        self.chat_writer = ChatWriter(self.chat_collection, self.user_stats)
+        self.memory = ChatMemory(self.chat_collection, self.chat_writer, max_age=CLUSTER_HISTORY_MAX_AGE if self.clustered else None)
+        self.summaries = ChatSummaries(self.summary_collection, self.chat_collection)
+        self.settings = SettingsCache(self.grudge_collection, self.config_collection)
+        self.content_pool = ContentPool(self.pool_collection)
+        # Each cluster gets its share of the global budget (guilds never span clusters).
+        global_rate = limits.RATE_GLOBAL and (limits.RATE_GLOBAL[0] / CLUSTER_COUNT, limits.RATE_GLOBAL[1])
+        self.limiter = limits.RateLimiter(global_=global_rate, exempt={self.owner_id})
+        self.health_collection = self.db["key_health"]
+        self.key_health = KeyHealth(self.health_collection)
         
-        # Create Indexes
-        await self.chat_collection.create_index("timestamp", expireAfterSeconds=2592000)
-        await self.crush_collection.create_index([("lover_id", 1), ("target_id", 1)], unique=True)
-        await self.grudge_collection.create_index("user_id", unique=True)
-
-        # Load Cogs
-        await self.load_extension("cogs.ai")
-        await self.load_extension("cogs.social")
-        await self.load_extension("cogs.admin")
-        await self.load_extension("cogs.general")
+        # Indexes, in-memory state and cogs don't depend on each other (the cogs only
+        # touch state once the bot is ready), so they load side by side.
+        index_report, _, _ = await asyncio.gather(
+            timed(timings, "indexes", self._ensure_indexes()),
+            timed(timings, "state", self._load_state()),
+            timed(timings, "cogs", self._load_cogs()),
+        )
+
+        # Metrics (labelled per cluster; gateway latency per shard)
+        if self.clustered:
+            metrics.REGISTRY.labels["cluster"] = self.cluster_id
+            for shard_id in self.shard_ids:
+                metrics.gauge("gateway_latency_ms", lambda s=shard_id: self.get_shard(s).latency * 1000, shard=shard_id)
+        metrics.gauge("history_queue_depth", lambda: self.chat_writer.depth)
+        metrics.gauge("history_cached_users", lambda: len(self.memory))
+        metrics.gauge("avatar_cache_bytes", lambda: self.avatar_cache.used)
+        metrics.gauge("ship_cache_bytes", lambda: self.ship_cache.used)
+        for kind in self.content_pool.sizes:
+            metrics.gauge("content_pool_size", lambda kind=kind: self.content_pool.sizes[kind], kind=kind)
+        if os.getenv("METRICS_PORT"):
+            port = int(os.getenv("METRICS_PORT")) + self.cluster_id  # one port per cluster on a shared host
+            self.metrics_runner = await metrics.start_http_server(port)
+            print(f"📈 Metrics on :{port}/metrics")
+
+        # Background Writers
+        self.chat_writer.start()
+        try:
+            # Heroku-style dynos stop with SIGTERM; close cleanly so queued history is flushed.
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(self.close()))
+        except NotImplementedError:
+            pass
+
         print("✅ Database Connected & Cogs Loaded.")
+        timings["total"] = (time.perf_counter() - self.started) * 1000
+        print("⏱️ Startup: " + " | ".join(f"{name} {ms:.0f}ms" for name, ms in timings.items()) + f" ({index_report})")
+
+    async def _ensure_indexes(self):
+        """Builds only the indexes that don't exist yet (matched by key pattern)."""
+        wanted = [
+            (self.chat_collection, [("timestamp", 1)], {"expireAfterSeconds": 2592000}),
+            (self.chat_collection, [("user_id", 1), ("timestamp", -1)], {}),
+            (self.crush_collection, [("lover_id", 1), ("target_id", 1)], {"unique": True}),
+            (self.grudge_collection, [("user_id", 1)], {"unique": True}),
+            (self.pool_collection, [("kind", 1), ("created_at", 1)], {}),
+            (self.summary_collection, [("user_id", 1)], {"unique": True}),
+            (self.stats_collection, [("user_id", 1), ("day", 1)], {"unique": True}),
+            (self.stats_collection, [("day", 1), ("user_id", 1)], {}),
+        ]
+        collections = {c.name: c for c, _, _ in wanted}
+        infos = await asyncio.gather(*(c.index_information() for c in collections.values()))
+        existing = {name: [list(info["key"]) for info in indexes.values()] for name, indexes in zip(collections, infos)}
+        missing = [(c, keys, opts) for c, keys, opts in wanted if keys not in existing[c.name]]
+        await asyncio.gather(*(c.create_index(keys, **opts) for c, keys, opts in missing))
+        return f"{len(missing)} indexes built, {len(wanted) - len(missing)} already there"
+
+    async def _load_state(self):
+        """Grudges, Server Configs, the content pool counts & Key Health (held in memory)."""
+        await asyncio.gather(self.settings.load(), self.content_pool.load(), self.key_health.load())
+        if os.getenv("MONGO_CHANGE_STREAMS"):
+            self.settings_watcher = asyncio.create_task(self.settings.watch())
+        if self.clustered:
+            self.state_poller = asyncio.create_task(self._poll_shared_state())
+
+    async def _load_cogs(self):
+        for name in ("cogs.ai", "cogs.social", "cogs.admin", "cogs.general"):
+            await self.load_extension(name)
+
+    async def _poll_shared_state(self):
+        """Cluster mode: picks up grudges, configs and benched keys written by other processes."""
+        while True:
+            await asyncio.sleep(STATE_POLL_INTERVAL)
+            try:
+                # The watcher gives up (returns) when change streams aren't supported; poll then too.
+                watcher = getattr(self, "settings_watcher", None)
+                if not watcher or watcher.done(): await self.settings.load()
+                await self.key_health.load()
+            except Exception as e:
+                print(f"State Poll Error: {e}")
+
+    async def close(self):
+        if getattr(self, "settings_watcher", None):
+            self.settings_watcher.cancel()
+        if getattr(self, "state_poller", None):
+            self.state_poller.cancel()
+        if hasattr(self, "chat_writer"):
+            await self.chat_writer.close()
+        if hasattr(self, "session"):
+            await self.session.close()
+        if getattr(self, "metrics_runner", None):
+            await self.metrics_runner.cleanup()
+        imaging.shutdown()
+        await super().close()
 
     async def on_ready(self):
         print(f'✨ Logged in as {self.user} (ID: {self.user.id})')
+        if not hasattr(self, "ready_after"):
+            self.ready_after = time.perf_counter() - self.started
+            print(f'🚀 Ready {self.ready_after:.1f}s after launch')
+        if self.clustered: print(f'🧩 Cluster {self.cluster_id}: shards {self.shard_ids} of {self.shard_count}')
         print('------')
 
-bot = YuriBot()
+def run_cluster(cluster_id=None, cluster_count=1, shard_count=None):
+    load_dotenv()
+    shard_ids = cluster_shards(cluster_id, cluster_count, shard_count) if cluster_id is not None else None
+    bot = YuriBot(cluster_id, shard_ids, shard_count)
+    bot.run(os.getenv('DISCORD_TOKEN'))
 
-@bot.command()
-@commands.is_owner()
-async def sync(ctx):
-    synced = await ctx.bot.tree.sync()
-    await ctx.send(f"Synced {len(synced)} slash commands.")
+def launch_clusters(cluster_count, shard_count):
+    """Runs every cluster as a child process, restarting any that die."""
+    ctx = multiprocessing.get_context("spawn")
+    procs = {}
+    stopping = False
+
+    def start(i):
+        procs[i] = ctx.Process(target=run_cluster, args=(i, cluster_count, shard_count), name=f"yuri-cluster-{i}")
+        procs[i].start()
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+        for proc in procs.values(): proc.terminate()  # SIGTERM: each cluster flushes and closes
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"🧩 Launching {cluster_count} clusters over {shard_count} shards.")
+    for i in range(cluster_count): start(i)
+    while not stopping:
+        time.sleep(5)
+        for i, proc in list(procs.items()):
+            if not proc.is_alive() and not stopping:
+                print(f"💥 Cluster {i} exited ({proc.exitcode}), restarting.")
+                start(i)
+    for proc in procs.values(): proc.join(30)
+
+def main():
+    if CLUSTER_COUNT <= 1 and CLUSTER_ID is None:
+        run_cluster(shard_count=int(SHARD_COUNT) if SHARD_COUNT else None)
+        return
+    if CLUSTER_ID is not None and not SHARD_COUNT:
+        # Each dyno would ask Discord separately, and differing answers overlap or orphan shards.
+        raise SystemExit("❌ CRITICAL: SHARD_COUNT must be set when CLUSTER_ID is (the same on every cluster).")
+    shard_count = int(SHARD_COUNT) if SHARD_COUNT else recommended_shards(os.getenv('DISCORD_TOKEN'))
+    shard_count = max(shard_count, CLUSTER_COUNT)
+    if CLUSTER_ID is not None: run_cluster(int(CLUSTER_ID), CLUSTER_COUNT, shard_count)
+    else: launch_clusters(CLUSTER_COUNT, shard_count)
 
-bot.run(os.getenv('DISCORD_TOKEN'))
+if __name__ == "__main__":
+    main()
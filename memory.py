@@ -0,0 +1,403 @@
+import os
+import asyncio
+import time
+import contextlib
+import datetime
+from collections import OrderedDict, deque
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+import metrics
+
+# --- CONFIG ---
+HISTORY_LIMIT = 40       # turns cached per user (covers the unsummarized backlog; the token budget trims what's sent)
+MAX_CACHED_USERS = 2000  # LRU bound on users held in memory
+FLUSH_BATCH = 50         # flush as soon as this many turns are queued...
+FLUSH_INTERVAL = 2.0     # ...or after this many seconds, whichever is first
+MAX_PENDING = 10000      # drop the oldest queued turns beyond this if Mongo is down
+SUMMARY_KEEP = 10        # newest turns always sent raw once a user has a summary
+COMPACT_AFTER = 20       # unsummarized turns (beyond SUMMARY_KEEP) before folding
+COMPACT_BATCH = 60       # most turns folded into the summary per pass
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 1500))  # rough cap on history tokens per request (~4 chars/token)
+
+
+class ChatWriter:
+    """Write-behind queue that batches chat turns into insert_many calls."""
+
+    def __init__(self, collection, stats=None, batch_size=FLUSH_BATCH, interval=FLUSH_INTERVAL):
+        self.collection = collection
+        self.stats = stats
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = []
+        self._inflight = []
+        self._recalled = set()  # _ids wiped while their batch was already being written
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._lock = asyncio.Lock()
+        self._task = None
+
+        self.flushes = 0
+        self.written = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+        self.avg_flush_ms = 0.0
+
+    @property
+    def depth(self):
+        return len(self._queue)
+
+    def start(self):
+        if not self._task: self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, docs):
+        for doc in docs: doc.setdefault("_id", ObjectId())
+        self._queue.extend(docs)
+        if len(self._queue) > MAX_PENDING:
+            overflow = len(self._queue) - MAX_PENDING
+            del self._queue[:overflow]
+            self.dropped += overflow
+        if len(self._queue) >= self.batch_size: self._wakeup.set()
+
+    def pending(self, user_id):
+        """Turns for user_id that may not be visible in Mongo yet."""
+        return [d for d in self._inflight + self._queue if d["user_id"] == user_id]
+
+    def discard(self, user_id=None):
+        """Drops queued turns (for one user, or everyone) after a wipe."""
+        wiped = lambda d: user_id is None or d["user_id"] == user_id
+        self._queue = [d for d in self._queue if not wiped(d)]
+        # A batch already handed to insert_many can't be recalled; its wiped turns are deleted once it lands.
+        self._recalled.update(d["_id"] for d in self._inflight if wiped(d))
+
+    async def _run(self):
+        while not self._stopping:
+            try: await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError: pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self._queue: return
+            batch, self._queue = self._queue, []
+            self._inflight = batch
+            start = time.perf_counter()
+            landed = []
+            try:
+                await self.collection.insert_many(batch, ordered=False)
+                landed = batch
+            except BulkWriteError as e:
+                # Duplicate keys mean a retried turn already landed; only requeue real failures.
+                failed = {err["index"] for err in e.details.get("writeErrors", []) if err.get("code") != 11000}
+                print(f"History Flush Error ({len(failed)}/{len(batch)} turns failed)")
+                landed = [d for i, d in enumerate(batch) if i not in failed]
+                self._queue = [d for i, d in enumerate(batch) if i in failed] + self._queue
+            except Exception as e:
+                print(f"History Flush Error ({len(batch)} turns): {e}")
+                self._queue = batch + self._queue
+            except BaseException:
+                self._queue = batch + self._queue  # cancelled mid-write: keep the batch for the next flush
+                raise
+            finally:
+                self._inflight = []
+            if self._recalled: landed = await self._delete_recalled(landed)
+            self.written += len(landed)
+            elapsed = (time.perf_counter() - start) * 1000
+            metrics.observe("mongo_write", elapsed, op="chat_insert_many")
+            self.flushes += 1
+            self.last_flush_ms = elapsed
+            self.avg_flush_ms = elapsed if self.flushes == 1 else self.avg_flush_ms * 0.9 + elapsed * 0.1
+            if self.stats and landed: await self.stats.record(landed)
+
+    @contextlib.asynccontextmanager
+    async def paused(self):
+        """Holds off flushes (turns keep queueing) so chat_history and the stats stay still."""
+        async with self._lock:
+            yield
+
+    async def _delete_recalled(self, landed):
+        """Removes turns wiped mid-flush from Mongo and the queue -> the landed turns that still count."""
+        recalled, self._recalled = self._recalled, set()
+        self._queue = [d for d in self._queue if d["_id"] not in recalled]
+        ids = [d["_id"] for d in landed if d["_id"] in recalled]
+        if ids:
+            try: await self.collection.delete_many({"_id": {"$in": ids}})
+            except Exception as e: print(f"History Recall Error ({len(ids)} turns): {e}")
+        return [d for d in landed if d["_id"] not in recalled]
+
+    async def close(self):
+        """Stops the background loop (letting a flush in progress finish) and writes out whatever is still queued."""
+        if self._task:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+class ChatMemory:
+    """Write-through LRU of per-user ring buffers over chat_collection.
+
+    Each cached user holds their most recent HISTORY_LIMIT turns, oldest first,
+    so the hot path only touches Mongo on a cache miss. Writes go through a
+    ChatWriter, so a reload also picks up turns that are still queued.
+    With max_age set (cluster mode, where another process may be talking to
+    the same user) windows older than max_age seconds are reloaded.
+    """
+
+    def __init__(self, collection, writer, limit=HISTORY_LIMIT, max_users=MAX_CACHED_USERS, max_age=None):
+        self.collection = collection
+        self.writer = writer
+        self.limit = limit
+        self.max_users = max_users
+        self.max_age = max_age
+        self._windows = OrderedDict()
+        self._loaded_at = {}
+
+    async def get_history(self, user_id):
+        """Returns the user's recent turns as Gemini-style history dicts."""
+        window = self._windows.get(user_id)
+        if window is not None and self.max_age and time.monotonic() - self._loaded_at[user_id] > self.max_age:
+            del self._windows[user_id]
+            window = None
+        if window is None:
+            window = await self._load(user_id)
+        else:
+            self._windows.move_to_end(user_id)
+        return [{"role": t["role"], "parts": list(t["parts"]), "timestamp": t["timestamp"]} for t in window]
+
+    async def _load(self, user_id):
+        # Newest first on the (user_id, timestamp) index, then flipped back to
+        # chronological order. _id breaks ties between turns saved together.
+        cursor = self.collection.find(
+            {"user_id": user_id}, {"role": 1, "parts": 1, "timestamp": 1}
+        ).sort([("timestamp", -1), ("_id", -1)]).limit(self.limit)
+        with metrics.timer("mongo_read", op="history_window"):
+            docs = [doc async for doc in cursor]
+        seen = {d["_id"] for d in docs}
+        docs += [d for d in self.writer.pending(user_id) if d["_id"] not in seen]
+        docs.sort(key=lambda d: (d["timestamp"], d["_id"]))
+        window = deque(({"role": d["role"], "parts": d["parts"], "timestamp": d["timestamp"]} for d in docs), maxlen=self.limit)
+        # Another request may have filled the slot while we were waiting on Mongo.
+        if user_id in self._windows: return self._windows[user_id]
+        self._remember(user_id, window)
+        return window
+
+    def _remember(self, user_id, window):
+        self._windows[user_id] = window
+        self._windows.move_to_end(user_id)
+        self._loaded_at[user_id] = time.monotonic()
+        while len(self._windows) > self.max_users:
+            old, _ = self._windows.popitem(last=False)
+            self._loaded_at.pop(old, None)
+
+    def save_turns(self, user_id, docs):
+        """Queues turns for Mongo and appends them to the cached window (if loaded)."""
+        self.writer.enqueue(docs)
+        window = self._windows.get(user_id)
+        if window is not None:
+            window.extend({"role": d["role"], "parts": d["parts"], "timestamp": d["timestamp"]} for d in docs)
+
+    def invalidate(self, user_id):
+        self._windows.pop(user_id, None)
+        self._loaded_at.pop(user_id, None)
+        self.writer.discard(user_id)
+
+    def clear(self):
+        self._windows.clear()
+        self._loaded_at.clear()
+        self.writer.discard()
+
+    def __len__(self):
+        return len(self._windows)
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def fit_history(history, summary=None, until=None, budget=HISTORY_TOKEN_BUDGET):
+    """Newest turns that fit the token budget, as Gemini history.
+
+    With a summary, only turns newer than what it covers (`until`) are
+    candidates; all of them go in unless the budget runs out.
+    """
+    if summary and until: history = [t for t in history if t["timestamp"] > until]
+    budget -= estimate_tokens(summary or "")
+    fitted = []
+    for turn in reversed(history):
+        cost = sum(estimate_tokens(p) for p in turn["parts"] if isinstance(p, str))
+        if cost > budget: break
+        budget -= cost
+        fitted.append({"role": turn["role"], "parts": turn["parts"]})
+    fitted.reverse()
+    # Gemini wants the history to open with a user turn.
+    while fitted and fitted[0]["role"] != "user": fitted.pop(0)
+    return fitted
+
+
+class ChatSummaries:
+    """Rolling per-user summaries of older chat turns (chat_summaries collection).
+
+    Turns older than the newest SUMMARY_KEEP are folded into a short summary in
+    the background, so prompts carry summary + a few raw turns instead of the
+    whole window.
+    """
+
+    def __init__(self, collection, chat_collection, max_users=MAX_CACHED_USERS):
+        self.collection = collection
+        self.chat_collection = chat_collection
+        self.max_users = max_users
+        self._cache = OrderedDict()  # user_id -> summary doc ({} when there is none)
+        self._fresh = {}             # user_id -> turns saved since the last compaction
+        self.dirty = set()
+        self.compactions = 0
+        self.folded = 0
+
+    async def get(self, user_id):
+        """The user's summary text, or None."""
+        doc = self._cache.get(user_id)
+        if doc is None:
+            with metrics.timer("mongo_read", op="summary"):
+                doc = await self.collection.find_one({"user_id": user_id}) or {}
+            self._cache[user_id] = doc
+            while len(self._cache) > self.max_users: self._cache.popitem(last=False)
+        self._cache.move_to_end(user_id)
+        return doc.get("summary")
+
+    def until(self, user_id):
+        """Timestamp of the newest turn the cached summary covers, or None."""
+        return (self._cache.get(user_id) or {}).get("until")
+
+    def touch(self, user_id, turns):
+        """Notes newly saved turns; marks the user for compaction once enough pile up."""
+        self._fresh[user_id] = self._fresh.get(user_id, 0) + turns
+        if self._fresh[user_id] >= COMPACT_AFTER + SUMMARY_KEEP: self.dirty.add(user_id)
+
+    async def forget(self, user_id=None):
+        query = {} if user_id is None else {"user_id": user_id}
+        await self.collection.delete_many(query)
+        if user_id is None:
+            self._cache.clear(); self._fresh.clear(); self.dirty.clear()
+        else:
+            self._cache.pop(user_id, None); self._fresh.pop(user_id, None); self.dirty.discard(user_id)
+
+    async def compact(self, user_id, summarize):
+        """Folds the user's oldest unsummarized turns into their summary via summarize(old, turns)."""
+        self.dirty.discard(user_id)
+        doc = await self.collection.find_one({"user_id": user_id}) or {}
+        query = {"user_id": user_id}
+        if doc.get("until"): query["timestamp"] = {"$gt": doc["until"]}
+        cursor = self.chat_collection.find(query, {"role": 1, "parts": 1, "timestamp": 1}).sort([("timestamp", 1), ("_id", 1)])
+        turns = [t async for t in cursor.limit(COMPACT_BATCH + SUMMARY_KEEP)]
+
+        cut = len(turns) - SUMMARY_KEEP
+        # Never split a user/model pair saved under the same timestamp.
+        while cut > 0 and turns[cut]["timestamp"] == turns[cut - 1]["timestamp"]: cut -= 1
+        if cut < COMPACT_AFTER:
+            self._fresh[user_id] = len(turns)
+            return False
+
+        summary = await summarize(doc.get("summary"), turns[:cut])
+        if not summary: return False
+        until = turns[cut - 1]["timestamp"]
+        new_doc = {"user_id": user_id, "summary": summary.strip(), "until": until, "updated_at": datetime.datetime.utcnow()}
+        with metrics.timer("mongo_write", op="summary"):
+            await self.collection.update_one({"user_id": user_id}, {"$set": new_doc}, upsert=True)
+        self._cache[user_id] = new_doc
+        self._fresh[user_id] = len(turns) - cut
+        if len(turns) == COMPACT_BATCH + SUMMARY_KEEP: self.dirty.add(user_id)  # more backlog to fold
+        self.compactions += 1
+        self.folded += cut
+        return True
+
+
+class ActivityStats:
+    """Turn counters per user and per user per day (user_stats collection).
+
+    Updated with $inc upserts each time the ChatWriter lands a batch, so the
+    owner commands read one document per user (day=None) or per user-day
+    instead of scanning chat_history. Counts are best effort: a failed
+    update is logged, not retried; rebuild() recounts from chat_history.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.updates = 0
+        self.errors = 0
+
+    @staticmethod
+    def day(timestamp):
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    async def record(self, docs):
+        counts = {}  # (user_id, day) -> [user turns, model turns, first seen, last seen]
+        for doc in docs:
+            ts = doc["timestamp"]
+            for key in ((doc["user_id"], None), (doc["user_id"], self.day(ts))):
+                entry = counts.setdefault(key, [0, 0, ts, ts])
+                entry[0 if doc["role"] == "user" else 1] += 1
+                entry[2], entry[3] = min(entry[2], ts), max(entry[3], ts)
+        ops = [
+            UpdateOne({"user_id": user_id, "day": day},
+                      {"$inc": {"user_turns": u, "model_turns": m}, "$min": {"first_seen": first}, "$max": {"last_seen": last}},
+                      upsert=True)
+            for (user_id, day), (u, m, first, last) in counts.items()
+        ]
+        try:
+            with metrics.timer("mongo_write", op="user_stats"):
+                await self.collection.bulk_write(ops, ordered=False)
+            self.updates += len(ops)
+        except Exception as e:
+            self.errors += 1
+            print(f"User Stats Error ({len(ops)} updates): {e}")
+
+    async def users(self):
+        return await self.collection.count_documents({"day": None})
+
+    async def top(self, since, until=None, limit=20):
+        """[(user_id, user turns, model turns)] over the day docs in [since, until), busiest first."""
+        match = {"day": {"$gte": self.day(since)}}
+        if until: match["day"]["$lt"] = until
+        pipeline = [
+            {"$match": match},
+            {"$group": {"_id": "$user_id", "user_turns": {"$sum": "$user_turns"}, "model_turns": {"$sum": "$model_turns"}}},
+            {"$sort": {"user_turns": -1}},
+            {"$limit": limit},
+        ]
+        with metrics.timer("mongo_read", op="user_stats"):
+            return [(d["_id"], d["user_turns"], d["model_turns"]) async for d in self.collection.aggregate(pipeline)]
+
+    async def rebuild(self, writer):
+        """Recounts everything from chat_history (one aggregation; for first deploys or after drift).
+
+        The writer is paused meanwhile, so no turn lands (or gets counted by
+        record()) between the wipe and the recount.
+        """
+        async with writer.paused():
+            await self._recount(writer.collection)
+        return await self.users()
+
+    async def _recount(self, chat_collection):
+        await self.collection.delete_many({})
+        is_user = {"$cond": [{"$eq": ["$role", "user"]}, 1, 0]}
+        await chat_collection.aggregate([
+            {"$group": {
+                "_id": {"user_id": "$user_id", "day": {"$dateTrunc": {"date": "$timestamp", "unit": "day"}}},
+                "user_turns": {"$sum": is_user}, "model_turns": {"$sum": {"$subtract": [1, is_user]}},
+                "first_seen": {"$min": "$timestamp"}, "last_seen": {"$max": "$timestamp"},
+            }},
+            {"$project": {"_id": 0, "user_id": "$_id.user_id", "day": "$_id.day",
+                          "user_turns": 1, "model_turns": 1, "first_seen": 1, "last_seen": 1}},
+            {"$merge": {"into": self.collection.name}},
+        ]).to_list(None)
+        await self.collection.aggregate([
+            {"$group": {
+                "_id": "$user_id", "user_turns": {"$sum": "$user_turns"}, "model_turns": {"$sum": "$model_turns"},
+                "first_seen": {"$min": "$first_seen"}, "last_seen": {"$max": "$last_seen"},
+            }},
+            {"$project": {"_id": 0, "user_id": "$_id", "day": {"$literal": None},
+                          "user_turns": 1, "model_turns": 1, "first_seen": 1, "last_seen": 1}},
+            {"$merge": {"into": self.collection.name}},
+        ]).to_list(None)
@@ -0,0 +1,134 @@
+import time
+import bisect
+from collections import deque
+from contextlib import contextmanager
+
+# Latency buckets in milliseconds (exported to Prometheus as seconds).
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=512)  # raw samples for p50/p99
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        self.recent.append(ms)
+
+    def quantile(self, q):
+        if not self.recent: return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Registry:
+    """In-process histograms, counters and gauges keyed by (name, labels)."""
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.labels = {}  # attached to every series (e.g. the shard/cluster id)
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def observe(self, name, ms, **labels):
+        key = self._key(name, labels)
+        hist = self.histograms.get(key)
+        if hist is None: hist = self.histograms[key] = Histogram()
+        hist.observe(ms)
+
+    def inc(self, name, n=1, **labels):
+        key = self._key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def gauge(self, name, fn, **labels):
+        """Registers a callable sampled whenever metrics are read."""
+        self.gauges[self._key(name, labels)] = fn
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000, **labels)
+
+    # --- OUTPUT ---
+    def _label_str(self, labels, extra=()):
+        pairs = list(self.labels.items()) + list(labels) + list(extra)
+        if not pairs: return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    def render_prometheus(self):
+        lines = []
+        typed = set()
+
+        def declare(metric, kind):
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} {kind}")
+
+        for (name, labels), hist in sorted(self.histograms.items()):
+            metric = f"yuri_{name}_seconds"
+            declare(metric, "histogram")
+            cumulative = 0
+            for bound, n in zip(BUCKETS_MS, hist.counts):
+                cumulative += n
+                lines.append(f"{metric}_bucket{self._label_str(labels, [('le', bound / 1000)])} {cumulative}")
+            lines.append(f"{metric}_bucket{self._label_str(labels, [('le', '+Inf')])} {hist.count}")
+            lines.append(f"{metric}_sum{self._label_str(labels)} {hist.sum / 1000}")
+            lines.append(f"{metric}_count{self._label_str(labels)} {hist.count}")
+        for (name, labels), value in sorted(self.counters.items()):
+            declare(f"yuri_{name}_total", "counter")
+            lines.append(f"yuri_{name}_total{self._label_str(labels)} {value}")
+        for (name, labels), fn in sorted(self.gauges.items(), key=lambda kv: kv[0]):
+            try: value = fn()
+            except Exception: continue
+            declare(f"yuri_{name}", "gauge")
+            lines.append(f"yuri_{name}{self._label_str(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def render_table(self):
+        """Plain-text summary for !stats."""
+        def label(name, labels):
+            return name + (f"[{','.join(v for _, v in labels)}]" if labels else "")
+
+        rows = [f"{'LATENCY':<40}{'n':>7}{'p50':>9}{'p99':>9}"]
+        for (name, labels), h in sorted(self.histograms.items()):
+            rows.append(f"{label(name, labels):<40}{h.count:>7}{h.quantile(0.5):>7.0f}ms{h.quantile(0.99):>7.0f}ms")
+        if self.counters:
+            rows.append("")
+            rows.append(f"{'COUNTER':<40}{'total':>7}")
+            for (name, labels), value in sorted(self.counters.items()):
+                rows.append(f"{label(name, labels):<40}{value:>7}")
+        return "\n".join(rows)
+
+
+REGISTRY = Registry()
+observe = REGISTRY.observe
+inc = REGISTRY.inc
+gauge = REGISTRY.gauge
+timer = REGISTRY.timer
+
+
+async def start_http_server(port, registry=REGISTRY):
+    """Serves /metrics in Prometheus text format; returns the runner to clean up."""
+    from aiohttp import web
+
+    async def handle(_):
+        return web.Response(text=registry.render_prometheus(), content_type="text/plain")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    return runner
@@ -0,0 +1,120 @@
+import re
+import time
+import asyncio
+from collections import OrderedDict
+from limits import TokenBucket
+import metrics
+
+# --- CONFIG ---
+MESSAGE_LIMIT = 2000            # Discord's content cap
+CHANNEL_BURST, CHANNEL_PER = 5, 5.0  # Discord's per-channel message bucket (5 per 5s)
+MAX_CHANNELS = 2000             # idle channel lanes kept around
+FENCE = re.compile(r"```(?:\w{1,20}(?=\n))?")  # a language tag only counts on an opening line
+SEPARATORS = ("\n```", "\n\n", "\n", " ")  # preferred cut points, best first
+
+
+def _open_fence(text, fence=None):
+    """The fence ('```lang') still open at the end of text, given the one open at its start."""
+    for match in FENCE.finditer(text):
+        fence = None if fence else match.group(0)
+    return fence
+
+
+def split_message(text, limit=MESSAGE_LIMIT):
+    """Splits text into messages of at most limit chars.
+
+    Cuts before a code block, then at a blank line, a newline or a space
+    (never in the first half of a message); only a single unbroken word is
+    cut mid-way. A code block cut in two is closed and reopened with the
+    same language so both halves still render.
+    """
+    chunks, fence = [], None
+    text = text.strip()
+    while text.strip():
+        prefix = fence + "\n" if fence else ""
+        if len(prefix) + len(text) <= limit:
+            chunks.append(prefix + text)
+            break
+        budget = limit - len(prefix) - 4  # room to close a fence
+        window = text[:budget]
+        cut, skip = budget, 0
+        for sep in SEPARATORS:
+            i = window.rfind(sep, budget // 2)
+            if i <= 0: continue
+            if sep != "\n```": cut, skip = i, len(sep)
+            elif _open_fence(window[:i], fence): cut, skip = i + 4, 0  # a closing fence stays with its block
+            else: cut, skip = i, 1  # an opening fence starts the next message
+            break
+        # Whitespace at the cut goes (indentation inside a code block stays); Discord rejects blank messages.
+        piece, text = window[:cut].rstrip(), text[cut + skip:]
+        fence = _open_fence(piece, fence)
+        text = text.lstrip("\n") if fence else text.lstrip()
+        if piece.strip(): chunks.append(prefix + piece + ("\n```" if fence else ""))
+    return chunks
+
+
+class Outbox:
+    """Per-channel queues in front of Discord sends and edits.
+
+    Calls for one channel run one at a time in arrival order, spaced to
+    Discord's per-channel bucket, so a busy channel waits here instead of
+    collecting 429s. Failures are logged and counted, never raised.
+    """
+
+    def __init__(self, burst=CHANNEL_BURST, per=CHANNEL_PER):
+        self.burst, self.per = burst, per
+        self._lanes = OrderedDict()  # channel_id -> (Lock, TokenBucket)
+        self.sent = 0
+        self.errors = 0
+        self.paced = 0
+        self.waited = 0.0
+
+    def _lane(self, channel_id):
+        lane = self._lanes.get(channel_id)
+        if lane is None:
+            if len(self._lanes) >= MAX_CHANNELS:
+                idle = [key for key, (lock, _) in self._lanes.items() if not lock.locked()]
+                for key in idle[:len(self._lanes) - MAX_CHANNELS + 1]: del self._lanes[key]
+            lane = self._lanes[channel_id] = (asyncio.Lock(), TokenBucket(self.burst, self.per, time.monotonic()))
+        self._lanes.move_to_end(channel_id)
+        return lane
+
+    async def send(self, channel_id, op, call):
+        """Awaits call() in the channel's queue -> its result, or None if it failed."""
+        lock, bucket = self._lane(channel_id)
+        async with lock:
+            bucket.refill(time.monotonic())
+            wait = bucket.wait()
+            if wait:
+                self.paced += 1
+                self.waited += wait
+                metrics.observe("outbox_wait", wait * 1000, op=op)
+                await asyncio.sleep(wait)
+                bucket.refill(time.monotonic())
+            bucket.tokens -= 1
+            try:
+                with metrics.timer("discord_send", op=op):
+                    result = await call()
+                self.sent += 1
+                return result
+            except Exception as e:
+                if getattr(e, "status", None) == 429: bucket.tokens = min(bucket.tokens, 0)
+                self.errors += 1
+                metrics.inc("discord_send_errors", op=op)
+                print(f"Send Error ({op}): {e}")
+                return None
+
+    def __len__(self):
+        return len(self._lanes)
+
+
+OUTBOX = Outbox()
+
+
+def channel_key(destination):
+    """The channel a Message, Interaction, Context or channel sends into."""
+    return getattr(destination, "channel_id", None) or getattr(getattr(destination, "channel", None), "id", None) or getattr(destination, "id", None)
+
+
+async def send(channel_id, op, call):
+    return await OUTBOX.send(channel_id, op, call)
@@ -0,0 +1,69 @@
+import re
+import datetime
+import utils
+import metrics
+
+# --- CONFIG ---
+POOL_TARGET = 40   # entries kept ready per kind
+POOL_BATCH = 10    # entries asked for per LLM request
+PROMPTS = {
+    "truth": "Write {n} different funny, spicy teenage Truth questions.",
+    "dare": "Write {n} different funny, chaotic Dares for a discord user.",
+}
+FORMAT_RULES = " One per line, no numbering, no intro, no GIF tags, nothing else. (Reply as Yuri.)"
+LIST_MARKER = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+
+class ContentPool:
+    """Mongo-backed stock of pre-generated /truth and /dare prompts.
+
+    Commands pop one entry (a single find_one_and_delete); refill() tops the
+    stock back up in batched LLM requests whenever there is spare capacity.
+    """
+
+    def __init__(self, collection, target=POOL_TARGET, batch=POOL_BATCH):
+        self.collection = collection
+        self.target = target
+        self.batch = batch
+        self.sizes = {kind: 0 for kind in PROMPTS}
+        self.served = 0
+        self.misses = 0
+
+    async def load(self):
+        for kind in PROMPTS:
+            self.sizes[kind] = await self.collection.count_documents({"kind": kind})
+
+    async def pop(self, kind):
+        with metrics.timer("mongo_write", op="pool_pop"):
+            doc = await self.collection.find_one_and_delete({"kind": kind}, sort=[("created_at", 1)])
+        if not doc:
+            self.sizes[kind] = 0
+            self.misses += 1
+            return None
+        self.sizes[kind] = max(0, self.sizes[kind] - 1)
+        self.served += 1
+        return doc["text"]
+
+    def neediest(self):
+        """The kind furthest below target, or None if every pool is full."""
+        kind = min(self.sizes, key=self.sizes.get)
+        return kind if self.sizes[kind] < self.target else None
+
+    @staticmethod
+    def parse(raw):
+        lines = []
+        for line in utils.GIF_TAG.sub("", raw or "").splitlines():
+            line = LIST_MARKER.sub("", line).strip().strip('"')
+            if 8 < len(line) < 300: lines.append(line)
+        return lines
+
+    async def refill(self, kind, generate):
+        """Asks for one batch of `kind` via generate(prompt) and stores what parses."""
+        raw = await generate(PROMPTS[kind].format(n=self.batch) + FORMAT_RULES)
+        entries = self.parse(raw)[:self.batch]
+        if not entries: return 0
+        now = datetime.datetime.utcnow()
+        with metrics.timer("mongo_write", op="pool_insert"):
+            await self.collection.insert_many([{"kind": kind, "text": text, "created_at": now} for text in entries])
+        self.sizes[kind] += len(entries)
+        return len(entries)
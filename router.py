@@ -0,0 +1,146 @@
+import time
+import asyncio
+from collections import deque
+from scheduler import SchedulerBusy, QUEUE_WAIT
+import metrics
+
+# --- CONFIG ---
+FAIL_THRESHOLD = 3     # consecutive failures before a breaker opens
+OPEN_BASE = 5.0        # first open period (seconds), doubled per failed probe...
+OPEN_MAX = 300.0       # ...up to this
+STALE_AFTER = 300.0    # forget latency data older than this and fall back to the prior
+EWMA_ALPHA = 0.2
+ERROR_HALF_LIFE = 15.0 # an idle backend's error penalty halves this often, so it gets retried
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+
+class Backend:
+    """One model endpoint plus its live health: latency, error rate, breaker state."""
+
+    def __init__(self, name, call, prior_ms=2000.0):
+        self.name = name
+        self.call = call
+        self.prior_ms = prior_ms
+
+        self.samples = deque(maxlen=100)
+        self.ewma_ms = None
+        self.error_rate = 0.0
+        self.last_seen = 0.0
+        self.error_at = 0.0  # when error_rate was last updated
+        self.calls = 0
+        self.errors = 0
+
+        self.state = CLOSED
+        self.failures = 0
+        self.open_for = OPEN_BASE
+        self.open_until = 0.0
+        self.probing = False
+
+    # --- HEALTH ---
+    def percentile(self, q):
+        if not self.samples: return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def p95(self):
+        return self.percentile(0.95)
+
+    def latency(self, now):
+        if self.ewma_ms is None or now - self.last_seen > STALE_AFTER: return self.prior_ms
+        return self.ewma_ms
+
+    def errors_now(self, now):
+        return self.error_rate * 0.5 ** ((now - self.error_at) / ERROR_HALF_LIFE)
+
+    def score(self, now):
+        """Expected cost of a call: latency inflated by how often it fails."""
+        return self.latency(now) * (1 + 4 * self.errors_now(now))
+
+    # --- BREAKER ---
+    def available(self, now):
+        if self.state == CLOSED: return True
+        if self.state == OPEN and now >= self.open_until:
+            self.state = HALF_OPEN
+        return self.state == HALF_OPEN and not self.probing
+
+    def record_success(self, elapsed_ms):
+        self.calls += 1
+        self.samples.append(elapsed_ms)
+        self.ewma_ms = elapsed_ms if self.ewma_ms is None else self.ewma_ms * (1 - EWMA_ALPHA) + elapsed_ms * EWMA_ALPHA
+        self.last_seen = time.monotonic()
+        self.error_rate = self.errors_now(self.last_seen) * (1 - EWMA_ALPHA)
+        self.error_at = self.last_seen
+        self.failures = 0
+        if self.state != CLOSED:
+            print(f"✅ {self.name} recovered.")
+        self.state = CLOSED
+        self.open_for = OPEN_BASE
+
+    def record_censored(self, elapsed_ms):
+        """A call that failed or was cancelled (lost a hedge) after elapsed_ms: its real
+        latency was at least that, so it still counts toward the percentiles."""
+        self.samples.append(elapsed_ms)
+
+    def record_failure(self):
+        now = time.monotonic()
+        self.calls += 1
+        self.errors += 1
+        self.error_rate = self.errors_now(now) * (1 - EWMA_ALPHA) + EWMA_ALPHA
+        self.error_at = now
+        self.failures += 1
+        if self.state == HALF_OPEN:
+            self.open_for = min(self.open_for * 2, OPEN_MAX)
+            self._trip(now)
+        elif self.failures >= FAIL_THRESHOLD:
+            self._trip(now)
+
+    def _trip(self, now):
+        self.state = OPEN
+        self.open_until = now + self.open_for
+        metrics.inc("llm_breaker_trips", backend=self.name)
+        print(f"⛔ {self.name} benched for {self.open_for:.0f}s.")
+
+
+class Router:
+    """Orders backends by observed health and records the outcome of each call."""
+
+    def __init__(self, backends):
+        self.backends = backends
+
+    def ranked(self):
+        now = time.monotonic()
+        live = [b for b in self.backends if b.available(now)]
+        # Stable sort: configured order still breaks ties between unknowns.
+        return sorted(live, key=lambda b: b.score(now))
+
+    async def call(self, backend, *args, **kwargs):
+        probe = backend.state == HALF_OPEN
+        if probe: backend.probing = True
+        # Time spent queued for our own scheduler slots is left out: it measures our
+        # concurrency caps, not the provider, and would make a busy lane look slow.
+        queued = [0.0]
+        token = QUEUE_WAIT.set(queued)
+        start = time.perf_counter()
+        provider_ms = lambda: ((time.perf_counter() - start) - queued[0]) * 1000
+        try:
+            result = await backend.call(*args, **kwargs)
+        except SchedulerBusy:
+            raise  # saturated, says nothing about health
+        except Exception:
+            backend.record_censored(provider_ms())
+            backend.record_failure()
+            metrics.inc("llm_errors", backend=backend.name)
+            raise
+        except asyncio.CancelledError:
+            # Lost a hedge race. Without this, slow calls never reach the samples and the hedge delay drifts low.
+            backend.record_censored(provider_ms())
+            raise
+        finally:
+            if probe: backend.probing = False
+            QUEUE_WAIT.reset(token)
+        elapsed = provider_ms()
+        backend.record_success(elapsed)
+        metrics.observe("llm_backend", elapsed, backend=backend.name)
+        return result
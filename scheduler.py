@@ -0,0 +1,144 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+import metrics
+
+# --- PRIORITIES (lower runs first) ---
+INTERACTIVE = 0   # mentions & replies, someone is watching the typing indicator
+COMMAND = 1       # /ask, /roast, /rate, /ship, /rename
+BACKGROUND = 2    # /truth, /dare and anything that can wait
+
+# --- CONFIG ---
+LANE_LIMITS = {
+    "gemini": int(os.getenv("LLM_CONCURRENCY_GEMINI", 4)),
+    "groq": int(os.getenv("LLM_CONCURRENCY_GROQ", 3)),  # per key
+}
+MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", 32))      # waiters per lane before shedding
+MAX_WAIT = float(os.getenv("LLM_MAX_WAIT", 15))      # seconds a request may sit in a queue
+
+
+# Seconds the current task has spent waiting for slots, while someone is counting (see Router.call).
+QUEUE_WAIT = contextvars.ContextVar("llm_queue_wait", default=None)
+
+
+class SchedulerBusy(Exception):
+    """Raised when a lane sheds a request instead of queueing it."""
+
+
+class Lane:
+    """Concurrency cap for one provider/key with a priority queue of waiters."""
+
+    def __init__(self, name, limit, max_queue=MAX_QUEUE, max_wait=MAX_WAIT):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.inflight = 0
+        self._waiters = []
+        self._seq = itertools.count()
+
+        self.admitted = 0
+        self.shed = 0
+        self.avg_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def _record_wait(self, started):
+        waited = (time.perf_counter() - started) * 1000
+        metrics.observe("llm_queue_wait", waited, lane=self.name)
+        self.admitted += 1
+        self.avg_wait_ms = waited if self.admitted == 1 else self.avg_wait_ms * 0.9 + waited * 0.1
+        self.max_wait_ms = max(self.max_wait_ms, waited)
+
+    def _drop(self, entry):
+        self._waiters.remove(entry)
+        heapq.heapify(self._waiters)
+
+    async def acquire(self, priority):
+        started = time.perf_counter()
+        if self.inflight < self.limit and not self._waiters:
+            self.inflight += 1
+            self._record_wait(started)
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            # Full: the newcomer only gets in by evicting someone less important.
+            worst = max(self._waiters)
+            if worst[0] <= priority:
+                self._shed("queue_full")
+                raise SchedulerBusy(self.name)
+            self._drop(worst)
+            worst[2].set_exception(SchedulerBusy(self.name))
+            self._shed("evicted")
+
+        entry = (priority, next(self._seq), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait_for(entry[2], timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            if entry in self._waiters: self._drop(entry)
+            self._shed("timeout")
+            raise SchedulerBusy(self.name)
+        except asyncio.CancelledError:
+            if entry in self._waiters: self._drop(entry)
+            elif entry[2].done() and not entry[2].cancelled() and entry[2].exception() is None:
+                self.release()  # slot was handed over just as we were cancelled
+            raise
+        self._record_wait(started)
+
+    def _shed(self, reason):
+        self.shed += 1
+        metrics.inc("llm_shed", lane=self.name, reason=reason)
+
+    def release(self):
+        # Hand the slot straight to the best waiter so inflight never dips below the cap.
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.inflight -= 1
+
+
+class LLMScheduler:
+    """Routes every model call through per-provider lanes (see LANE_LIMITS).
+
+    Lane names are "<provider>" or "<provider>:<key index>"; the provider part
+    picks the limit.
+    """
+
+    def __init__(self, limits=LANE_LIMITS):
+        self.limits = limits
+        self.lanes = {}
+
+    def lane(self, name):
+        if name not in self.lanes:
+            lane = self.lanes[name] = Lane(name, self.limits.get(name.split(":")[0], 2))
+            metrics.gauge("llm_lane_inflight", lambda: lane.inflight, lane=name)
+            metrics.gauge("llm_lane_queued", lambda: lane.queued, lane=name)
+        return self.lanes[name]
+
+    @asynccontextmanager
+    async def slot(self, lane_name, priority=COMMAND):
+        lane = self.lane(lane_name)
+        started = time.perf_counter()
+        try:
+            await lane.acquire(priority)
+        finally:
+            waited = QUEUE_WAIT.get()
+            if waited is not None: waited[0] += time.perf_counter() - started
+        try:
+            yield lane
+        finally:
+            lane.release()
+
+    def idle(self):
+        """True when nothing is queued and every lane has spare capacity."""
+        return all(l.queued == 0 and l.inflight < l.limit for l in self.lanes.values())
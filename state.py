@@ -0,0 +1,138 @@
+import asyncio
+import datetime
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+import metrics
+
+
+class SettingsCache:
+    """In-memory mirror of the grudges and server_configs collections.
+
+    Both are tiny and only change through the admin commands, so they are read
+    once at startup and updated in place. With watch() running, writes made by
+    other processes are picked up through Mongo change streams.
+    """
+
+    def __init__(self, grudge_collection, config_collection):
+        self.grudge_collection = grudge_collection
+        self.config_collection = config_collection
+        self.grudges = set()
+        self.configs = {}
+        # _id -> key, so change-stream deletes (which only carry _id) can be applied.
+        self._grudge_ids = {}
+        self._config_ids = {}
+
+    async def load(self):
+        grudges, configs = set(), {}
+        self._grudge_ids.clear()
+        self._config_ids.clear()
+        async for doc in self.grudge_collection.find({}, {"user_id": 1}):
+            grudges.add(doc["user_id"])
+            self._grudge_ids[doc["_id"]] = doc["user_id"]
+        async for doc in self.config_collection.find({}):
+            configs[doc["guild_id"]] = doc
+            self._config_ids[doc["_id"]] = doc["guild_id"]
+        self.grudges, self.configs = grudges, configs
+
+    # --- READS ---
+    def is_grudged(self, user_id):
+        return user_id in self.grudges
+
+    def get_config(self, guild_id):
+        return self.configs.get(guild_id)
+
+    # --- WRITES ---
+    async def add_grudge(self, user_id):
+        with metrics.timer("mongo_write", op="grudge"):
+            doc = await self.grudge_collection.find_one_and_update(
+                {"user_id": user_id}, {"$set": {"timestamp": datetime.datetime.utcnow()}}, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        self.grudges.add(user_id)
+        self._grudge_ids[doc["_id"]] = user_id  # delete events only carry the _id
+
+    async def remove_grudge(self, user_id):
+        with metrics.timer("mongo_write", op="grudge"):
+            await self.grudge_collection.delete_one({"user_id": user_id})
+        self.grudges.discard(user_id)
+
+    async def set_config(self, guild_id, **fields):
+        with metrics.timer("mongo_write", op="config"):
+            doc = await self.config_collection.find_one_and_update(
+                {"guild_id": guild_id}, {"$set": fields}, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        self.configs[guild_id] = doc
+        self._config_ids[doc["_id"]] = guild_id
+
+    # --- CHANGE STREAMS ---
+    async def watch(self):
+        """Follows both collections until cancelled (needs a replica set / Atlas)."""
+        await asyncio.gather(self._follow(self.grudge_collection, self._apply_grudge),
+                             self._follow(self.config_collection, self._apply_config))
+
+    async def _follow(self, collection, apply):
+        delay = 1
+        while True:
+            try:
+                async with collection.watch(full_document="updateLookup") as stream:
+                    # Anything written between load() and now would otherwise be missed.
+                    await self.load()
+                    delay = 1
+                    async for change in stream:
+                        apply(change)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                print(f"❌ Change streams unavailable ({collection.name}): {e}")
+                return
+            except Exception as e:
+                print(f"Change Stream Error ({collection.name}): {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+
+    def _apply_grudge(self, change):
+        _id = change["documentKey"]["_id"]
+        if change["operationType"] == "delete":
+            self.grudges.discard(self._grudge_ids.pop(_id, None))
+        elif change.get("fullDocument"):
+            user_id = change["fullDocument"]["user_id"]
+            self.grudges.add(user_id)
+            self._grudge_ids[_id] = user_id
+
+    def _apply_config(self, change):
+        _id = change["documentKey"]["_id"]
+        if change["operationType"] == "delete":
+            self.configs.pop(self._config_ids.pop(_id, None), None)
+        elif change.get("fullDocument"):
+            doc = change["fullDocument"]
+            self.configs[doc["guild_id"]] = doc
+            self._config_ids[_id] = doc["guild_id"]
+
+
+class KeyHealth:
+    """API keys that are benched after failing, shared through the key_health collection.
+
+    Every process writes its own failures there and re-reads the collection
+    on load(), so in cluster mode a key one process saw failing is skipped
+    by all of them until the bench expires.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.benched = {}  # key name -> benched until (UTC)
+
+    async def load(self):
+        now = datetime.datetime.utcnow()
+        self.benched = {doc["_id"]: doc["until"] async for doc in self.collection.find({"until": {"$gt": now}})}
+
+    def healthy(self, name):
+        until = self.benched.get(name)
+        return until is None or until <= datetime.datetime.utcnow()
+
+    async def bench(self, name, seconds):
+        until = datetime.datetime.utcnow() + datetime.timedelta(seconds=seconds)
+        self.benched[name] = until
+        try:
+            with metrics.timer("mongo_write", op="key_health"):
+                await self.collection.update_one({"_id": name}, {"$max": {"until": until}}, upsert=True)
+        except Exception as e:
+            print(f"Key Health Error ({name}): {e}")
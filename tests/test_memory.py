@@ -0,0 +1,126 @@
+import asyncio
+import datetime
+from memory import ChatWriter, ChatMemory
+
+
+class FakeChat:
+    """insert_many blocks until `release` is set, so a test can act mid-flush."""
+
+    def __init__(self):
+        self.docs = []
+        self.release = asyncio.Event()
+        self.release.set()
+        self.writing = asyncio.Event()
+
+    async def insert_many(self, batch, ordered=False):
+        self.writing.set()
+        await self.release.wait()
+        self.docs += batch
+
+    async def delete_many(self, query):
+        ids = query.get("_id", {}).get("$in")
+        user_id = query.get("user_id")
+        self.docs = [d for d in self.docs if not (
+            (ids is not None and d["_id"] in ids) or (ids is None and (user_id is None or d["user_id"] == user_id)))]
+
+
+class FakeStats:
+    def __init__(self): self.recorded = []
+    async def record(self, docs): self.recorded += docs
+
+
+def turn(user_id):
+    return {"user_id": user_id, "role": "user", "parts": ["hi"], "timestamp": datetime.datetime.utcnow()}
+
+
+def users(docs):
+    return sorted(d["user_id"] for d in docs)
+
+
+def test_wipe_during_flush_stays_wiped():
+    async def run():
+        chat, stats = FakeChat(), FakeStats()
+        writer = ChatWriter(chat, stats)
+        memory = ChatMemory(chat, writer)
+        writer.enqueue([turn(1), turn(2)])
+        chat.release.clear()
+        flush = asyncio.create_task(writer.flush())
+        await chat.writing.wait()
+        # /wipe order: invalidate first, then delete; the insert lands after both.
+        memory.invalidate(1)
+        await chat.delete_many({"user_id": 1})
+        chat.release.set()
+        await flush
+        return chat, stats
+
+    chat, stats = asyncio.run(run())
+    assert users(chat.docs) == [2]
+    assert users(stats.recorded) == [2]
+
+
+def test_wipe_all_during_flush_stays_wiped():
+    async def run():
+        chat = FakeChat()
+        writer = ChatWriter(chat)
+        memory = ChatMemory(chat, writer)
+        writer.enqueue([turn(1), turn(2)])
+        chat.release.clear()
+        flush = asyncio.create_task(writer.flush())
+        await chat.writing.wait()
+        memory.clear()
+        await chat.delete_many({})
+        writer.enqueue([turn(3)])
+        chat.release.set()
+        await flush
+        await writer.flush()
+        return chat
+
+    assert users(asyncio.run(run()).docs) == [3]
+
+
+def test_discard_drops_only_that_users_queued_turns():
+    async def run():
+        chat = FakeChat()
+        writer = ChatWriter(chat)
+        writer.enqueue([turn(1), turn(2), turn(1)])
+        writer.discard(1)
+        await writer.flush()
+        return chat
+
+    assert users(asyncio.run(run()).docs) == [2]
+
+
+def test_cancelled_flush_requeues_its_batch():
+    async def run():
+        chat = FakeChat()
+        writer = ChatWriter(chat)
+        writer.enqueue([turn(1)])
+        chat.release.clear()
+        flush = asyncio.create_task(writer.flush())
+        await chat.writing.wait()
+        flush.cancel()
+        try: await flush
+        except asyncio.CancelledError: pass
+        return writer
+
+    assert asyncio.run(run()).depth == 1
+
+
+def test_close_finishes_the_flush_in_progress_then_drains():
+    async def run():
+        chat = FakeChat()
+        writer = ChatWriter(chat, interval=0.01)
+        writer.start()
+        writer.enqueue([turn(1)])
+        chat.release.clear()
+        await chat.writing.wait()
+        writer.enqueue([turn(2)])
+        closing = asyncio.create_task(writer.close())
+        await asyncio.sleep(0.05)
+        chat.release.set()
+        await closing
+        return chat, writer
+
+    chat, writer = asyncio.run(run())
+    assert users(chat.docs) == [1, 2]
+    assert writer.depth == 0
@@ -0,0 +1,44 @@
+import random
+from outbox import split_message, MESSAGE_LIMIT
+
+
+def test_short_text_is_one_message():
+    assert split_message("hi there") == ["hi there"]
+    assert split_message("  \n\n ") == []
+
+
+def test_splits_on_words():
+    text = " ".join(f"word{i}" for i in range(1000))
+    chunks = split_message(text)
+    assert len(chunks) > 1
+    assert all(len(c) <= MESSAGE_LIMIT for c in chunks)
+    assert " ".join(chunks) == text
+
+
+def test_code_block_is_reopened_with_its_language():
+    text = "intro\n```py\n" + "\n".join(f"x = {i}" for i in range(600)) + "\n```\nafter"
+    chunks = split_message(text)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert len(chunk) <= MESSAGE_LIMIT
+        assert chunk.count("```") % 2 == 0
+    assert all(c.startswith("```py\n") for c in chunks[1:])
+    assert chunks[-1].endswith("after")
+
+
+def test_cuts_before_a_code_block():
+    text = "para " * 300 + "\n\n```\n" + "y\n" * 400 + "```\ntail"
+    chunks = split_message(text)
+    assert chunks[0].endswith("para")
+    assert chunks[1].startswith("```\n")
+
+
+def test_never_emits_blank_chunks():
+    rng = random.Random(7)
+    pieces = ["word", " ", "\n", "\n\n\n", "```", "```py", "    indented", "a" * 300]
+    for _ in range(300):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(1, 400)))
+        limit = rng.choice([50, 200, MESSAGE_LIMIT])
+        for chunk in split_message(text, limit):
+            assert chunk.strip()
+            assert len(chunk) <= limit
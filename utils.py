@@ -1,49 +1,108 @@
-import io
 import re
 import datetime
 import random
+from collections import OrderedDict, Counter
 import pytz
 import aiohttp
 import asyncio
-from PIL import Image
-from duckduckgo_search import DDGS
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 import discord
+import imaging
+import metrics
+import outbox
+
+# --- HTTP ---
+def create_http_session():
+    """One pooled session for the whole bot (keep-alive + cached DNS)."""
+    connector = aiohttp.TCPConnector(limit=64, limit_per_host=16, ttl_dns_cache=300, keepalive_timeout=60)
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=20, connect=5))
 
 # --- IMAGE TOOLS ---
-async def get_image_from_url(url):
-    """Downloads image with size limit (8MB) to prevent crashes."""
+class ImageCache:
+    """LRU of encoded image parts ({"mime_type", "data"}), bounded by their byte size."""
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    @staticmethod
+    def _cost(part):
+        return len(part["data"])
+
+    def get(self, key):
+        part = self._items.get(key)
+        if part is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._items.move_to_end(key)
+        return part
+
+    def put(self, key, part):
+        cost = self._cost(part)
+        if cost > self.max_bytes: return
+        if key in self._items: self.used -= self._cost(self._items.pop(key))
+        self._items[key] = part
+        self.used += cost
+        while self.used > self.max_bytes:
+            _, old = self._items.popitem(last=False)
+            self.used -= self._cost(old)
+
+    def __len__(self):
+        return len(self._items)
+
+MAX_IMAGE_BYTES = 8 * 1024 * 1024   # hard cap on downloaded bytes
+IMAGE_EXTENSIONS = ("png", "jpg", "jpeg", "webp")
+
+async def read_capped(resp, limit=MAX_IMAGE_BYTES):
+    """Streams a response body, giving up as soon as it exceeds limit bytes."""
+    if (resp.content_length or 0) > limit: return None
+    buf = bytearray()
+    async for chunk in resp.content.iter_chunked(64 * 1024):
+        buf += chunk
+        if len(buf) > limit: return None
+    return bytes(buf)
+
+async def get_image_from_url(session, url, max_side=imaging.MODEL_IMAGE_SIDE):
+    """Downloads an image (8MB cap) and returns it as a model-sized JPEG part."""
     try:
-        async with aiohttp.ClientSession() as session:
+        with metrics.timer("image_download"):
             async with session.get(url) as resp:
-                if resp.status == 200:
-                    if int(resp.headers.get('Content-Length', 0)) > 8 * 1024 * 1024:
-                        return None
-                    data = await resp.read()
-                    return Image.open(io.BytesIO(data))
-    except:
+                if resp.status != 200: return None
+                data = await read_capped(resp)
+        if data is None: return None
+        return await imaging.prepare(data, max_side)
+    except Exception:
         return None
-    return None
 
-def stitch_images(img1_data, img2_data):
-    """Combines two PIL images side-by-side."""
-    try:
-        base_height = 512
-        ratio1 = base_height / float(img1_data.size[1])
-        w1 = int((float(img1_data.size[0]) * float(ratio1)))
-        img1 = img1_data.resize((w1, base_height), Image.Resampling.LANCZOS)
-        
-        ratio2 = base_height / float(img2_data.size[1])
-        w2 = int((float(img2_data.size[0]) * float(ratio2)))
-        img2 = img2_data.resize((w2, base_height), Image.Resampling.LANCZOS)
-
-        total_width = w1 + w2
-        new_im = Image.new('RGB', (total_width, base_height))
-        new_im.paste(img1, (0, 0))
-        new_im.paste(img2, (w1, 0))
-        return new_im
-    except Exception as e:
-        print(f"Stitch Error: {e}")
-        return None
+async def get_avatar(session, cache, asset, size=512):
+    """Avatar as a JPEG part, cached by avatar hash + size so repeat lookups skip the network."""
+    if not asset: return None
+    key = (asset.key, size)
+    part = cache.get(key)
+    if part is None:
+        part = await get_image_from_url(session, asset.with_size(size).url, max_side=size)
+        if part: cache.put(key, part)
+    return part
+
+async def get_ship_image(session, avatars, ships, asset1, asset2):
+    """Both avatars side by side, cached by the pair of avatar hashes."""
+    if not asset1 or not asset2: return None
+    key = (asset1.key, asset2.key)
+    part = ships.get(key)
+    if part is None:
+        img1, img2 = await asyncio.gather(get_avatar(session, avatars, asset1), get_avatar(session, avatars, asset2))
+        if not img1 or not img2: return None
+        part = await imaging.stitch(img1, img2)
+        if part: ships.put(key, part)
+    return part
+
+async def noop(result=None):
+    return result
 
 # --- SEARCH & TIME TOOLS ---
 def get_smart_time(text_input):
@@ -65,9 +124,48 @@ def get_smart_time(text_input):
     local_time = utc_now.astimezone(ist)
     return f"{local_time.strftime('%A, %B %d, %I:%M %p')} (IST)"
 
-async def search_web(query):
+# DDGS is blocking; it gets its own small pool so a slow search can't starve the
+# default executor (asyncio.to_thread).
+SEARCH_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ddgs")
+SEARCH_TTL = 600        # seconds a web search result stays fresh
+SEARCH_CACHE_SIZE = 512
+_search_cache = OrderedDict()  # key -> (expires_at, result)
+_search_inflight = {}          # key -> Future shared by identical concurrent searches
+
+def normalize_query(query):
+    return " ".join(re.findall(r"\w+", query.lower()))
+
+def _ddgs():
+    # Imported on first search (inside the search thread), not at startup.
+    from duckduckgo_search import DDGS
+    return DDGS()
+
+async def run_ddgs(fn):
+    return await asyncio.get_running_loop().run_in_executor(SEARCH_POOL, fn)
+
+async def cached_search(key, fetch, ttl=SEARCH_TTL, refresh=False):
+    """TTL cache + single-flight around an async search. Failures (None) aren't cached."""
+    hit = _search_cache.get(key)
+    if hit and hit[0] > time.monotonic() and not refresh:
+        _search_cache.move_to_end(key)
+        metrics.inc("search_cache", kind=key[0], result="hit")
+        return hit[1]
+    metrics.inc("search_cache", kind=key[0], result="shared" if key in _search_inflight else "miss")
+    if key not in _search_inflight:
+        fut = asyncio.ensure_future(fetch())
+        _search_inflight[key] = fut
+        fut.add_done_callback(lambda _: _search_inflight.pop(key, None))
+    result = await asyncio.shield(_search_inflight[key])
+    if result is not None:
+        _search_cache[key] = (time.monotonic() + ttl, result)
+        _search_cache.move_to_end(key)
+        while len(_search_cache) > SEARCH_CACHE_SIZE: _search_cache.popitem(last=False)
+    return result
+
+async def _search_web(query):
     try:
-        results = await asyncio.to_thread(lambda: list(DDGS().text(query, max_results=2)))
+        with metrics.timer("web_search"):
+            results = await run_ddgs(lambda: list(_ddgs().text(query, max_results=2)))
         if not results: return None
         search_context = "\n[SYSTEM: WEB SEARCH RESULTS]\n"
         for res in results:
@@ -77,38 +175,146 @@ async def search_web(query):
         print(f"Search Error: {e}")
         return None
 
-async def search_gif_ddg(query):
+async def search_web(query):
+    return await cached_search(("text", normalize_query(query)), lambda: _search_web(query))
+
+GIF_TTL = 6 * 3600       # a pool of GIF results stays usable this long
+GIF_WARM_TOP = 20        # how many of the most used tags the warmer keeps fresh
+GIF_TAG_COUNTS = Counter()
+
+def _gif_key(query):
+    return ("gif", normalize_query(query))
+
+async def _search_gifs(query):
     try:
-        results = await asyncio.to_thread(lambda: list(DDGS().images(keywords=query, type_image='gif', max_results=8)))
-        if results: return random.choice(results)['image']
+        with metrics.timer("gif_search"):
+            results = await run_ddgs(lambda: list(_ddgs().images(keywords=query, type_image='gif', max_results=8)))
+        return [r['image'] for r in results] or None
     except Exception as e:
         print(f"GIF Search Error: {e}")
-    return None
+        return None
+
+async def get_gif_pool(query, refresh=False):
+    return await cached_search(_gif_key(query), lambda: _search_gifs(query), ttl=GIF_TTL, refresh=refresh)
+
+def _count_gif_tag(query):
+    GIF_TAG_COUNTS[normalize_query(query)] += 1
+    if len(GIF_TAG_COUNTS) > 1000:
+        keep = GIF_TAG_COUNTS.most_common(500)
+        GIF_TAG_COUNTS.clear()
+        GIF_TAG_COUNTS.update(dict(keep))
+
+async def search_gif_ddg(query):
+    _count_gif_tag(query)
+    pool = await get_gif_pool(query)
+    return random.choice(pool) if pool else None
 
-async def process_gif_tags(text):
+def cached_gif(query):
+    """A GIF from a pool that's already fresh in the cache, else None (never searches)."""
+    hit = _search_cache.get(_gif_key(query))
+    if not hit or hit[0] <= time.monotonic(): return None
+    _count_gif_tag(query)
+    metrics.inc("search_cache", kind="gif", result="hit")
+    return random.choice(hit[1])
+
+async def warm_gif_pools(margin=1800):
+    """Refreshes pools for the most used tags before they expire."""
+    for query, _ in GIF_TAG_COUNTS.most_common(GIF_WARM_TOP):
+        hit = _search_cache.get(("gif", query))
+        if not hit or hit[0] - time.monotonic() < margin:
+            await get_gif_pool(query, refresh=True)
+
+def extract_gif_tag(text):
+    """Splits a [GIF: query] tag off the reply text -> (text, query or None)."""
     gif_match = re.search(r"\[GIF:\s*(.*?)\]", text, re.IGNORECASE)
-    gif_url = None
-    if gif_match:
-        query = gif_match.group(1).strip()
-        gif_url = await search_gif_ddg(query)
-        text = text.replace(gif_match.group(0), "").strip()
-    return text, gif_url
+    if not gif_match: return text, None
+    return text.replace(gif_match.group(0), "").strip(), gif_match.group(1).strip()
 
 # --- DISCORD HELPERS ---
-async def send_chunked_reply(destination, text, mention_user=False):
-    if not text: return
-    chunks = [text[i:i+1900] for i in range(0, len(text), 1900)]
+async def send_chunked_reply(destination, text, mention_user=False, embed=None):
+    """Sends text split on block/line/word boundaries, with embed riding on the last
+    message, through the channel's outbox queue; returns the messages that went out."""
+    chunks = outbox.split_message(text) if text else []
+    if embed is not None and not chunks: chunks = [None]
+    channel = outbox.channel_key(destination)
+    sent = []
     for i, chunk in enumerate(chunks):
-        try:
-            if hasattr(destination, "reply") and i == 0:
-                await destination.reply(chunk, mention_author=mention_user)
-            elif hasattr(destination, "send"):
-                await destination.send(chunk)
-            elif hasattr(destination, "followup"):
-                await destination.followup.send(chunk)
+        extra = {"embed": embed} if embed is not None and i == len(chunks) - 1 else {}
+        if hasattr(destination, "reply") and i == 0:
+            call = partial(destination.reply, chunk, mention_author=mention_user, **extra)
+        elif hasattr(destination, "send"):
+            call = partial(destination.send, chunk, **extra)
+        elif hasattr(destination, "followup"):
+            call = partial(destination.followup.send, chunk, **extra)
+        else:
+            call = partial(destination.channel.send, chunk, **extra)
+        msg = await outbox.send(channel, "send", call)
+        if msg is None: break  # the rest would read out of context
+        sent.append(msg)
+    return sent
+
+GIF_TAG = re.compile(r"\[GIF:[^\]]*\]", re.IGNORECASE)
+PARTIAL_GIF_TAG = re.compile(r"\[(?:G(?:I(?:F(?::[^\]]*)?)?)?)?$", re.IGNORECASE)
+
+class StreamingReply:
+    """Posts a reply as soon as the first tokens arrive, then edits it as more stream in.
+
+    Edits are throttled to one flush per `interval` seconds (Discord allows ~5
+    edits / 5s per channel) and roll over into new messages where split_message
+    would cut. [GIF:] tags are hidden while streaming; the caller resolves them
+    from the final text.
+    """
+    def __init__(self, message, mention_user=False, interval=1.2, limit=outbox.MESSAGE_LIMIT):
+        self.message = message
+        self.mention_user = mention_user
+        self.interval = interval
+        self.limit = limit
+        self.sent = []        # discord.Message objects, in order
+        self.shown = []       # what each of them currently says
+        self._latest = ""
+        self._last_flush = 0.0
+        self._flushing = None
+
+    @staticmethod
+    def _visible(text):
+        return PARTIAL_GIF_TAG.sub("", GIF_TAG.sub("", text)).strip()
+
+    async def feed(self, text):
+        """Called with the full text so far; flushes in the background when due."""
+        self._latest = text
+        loop = asyncio.get_running_loop()
+        if (self._flushing is None or self._flushing.done()) and loop.time() - self._last_flush >= self.interval:
+            self._last_flush = loop.time()
+            self._flushing = asyncio.create_task(self._flush(self._visible(text)))
+
+    async def finish(self, final_text, embed=None):
+        """Waits out any in-flight edit, then makes the messages match final_text exactly
+        (embed, if given, goes onto the last one in the same call)."""
+        if self._flushing: await self._flushing
+        await self._flush(final_text or "", final=True, embed=embed)
+
+    async def _flush(self, text, final=False, embed=None):
+        chunks = outbox.split_message(text, self.limit) if text else []
+        if embed is not None and not chunks: chunks = [None]
+        channel = self.message.channel.id
+        for i, chunk in enumerate(chunks):
+            extra = {"embed": embed} if embed is not None and i == len(chunks) - 1 else {}
+            if i < len(self.sent):
+                if self.shown[i] != chunk or extra:
+                    if await outbox.send(channel, "edit", partial(self.sent[i].edit, content=chunk, **extra)) is None: return
+                    self.shown[i] = chunk
             else:
-                await destination.channel.send(chunk)
-        except Exception: pass
+                if i == 0: call = partial(self.message.reply, chunk, mention_author=self.mention_user, **extra)
+                else: call = partial(self.message.channel.send, chunk, **extra)
+                msg = await outbox.send(channel, "send", call)
+                if msg is None: return
+                self.sent.append(msg)
+                self.shown.append(chunk)
+        if final:
+            # A backend switch mid-stream can leave the final text shorter than what was shown.
+            for msg in self.sent[len(chunks):]:
+                await outbox.send(channel, "delete", msg.delete)
+            del self.sent[len(chunks):], self.shown[len(chunks):]
 
 def get_user_dossier(member: discord.Member):
     now = datetime.datetime.utcnow()
@@ -141,7 +347,9 @@ async def get_user_history_text(collection, user_id, limit=15):
     """Fetches recent text messages from a specific user for context."""
     cursor = collection.find({"user_id": user_id, "role": "user"}).sort("timestamp", -1).limit(limit)
     messages = []
-    async for doc in cursor:
+    with metrics.timer("mongo_read", op="user_history"):
+        docs = [doc async for doc in cursor]
+    for doc in docs:
         content = doc.get("parts", [""])[0]
         if isinstance(content, str) and len(content) < 200:
             messages.append(content)